@@ -40,7 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'mainapp',
+    'mainapp.apps.MainappConfig',
     'crispy_forms',
     'captcha'
 ]
@@ -53,13 +53,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mainapp.middleware.QueryProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'esse.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # the stock Django backend with render timing for the profiling middleware
+        'BACKEND': 'mainapp.profiling.ProfilingDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,6 +89,30 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/ref/settings/#caches
+# 'default' is shared by all processes, so the sidebar invalidation made by one worker reaches the others;
+# its table is created by migration 0026. Product cards are keyed by the product version and never need
+# invalidating, so they stay in a cheap per-process cache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'esse_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'esse-cards',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -136,6 +162,19 @@ STATICFILES_DIRS = (
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+# number of books per page in category listings and search results
+CATALOG_PAGE_SIZE = 24
+
+# per-view profiling (see mainapp.middleware.QueryProfilingMiddleware), stats are served at /profiling/ to staff
+PROFILING_ENABLED = True
+PROFILING_SLOW_REQUEST_MS = 500
+PROFILING_SLOW_QUERY_COUNT = 50
+
+# background jobs (see mainapp.jobs), run by "manage.py run_jobs"; times are in seconds
+JOBS_VISIBILITY_TIMEOUT = 60
+JOBS_RETRY_BACKOFF = 10
+JOBS_MAX_ATTEMPTS = 5
+
 CAPTCHA_FONT_SIZE = 30
 CAPTCHA_LENGTH = 5
 CAPTCHA_BACKGROUND_COLOR = '#E8F0FE'
@@ -1,12 +1,13 @@
 from PIL import Image
 
 from django.forms import forms
-from django.forms import ModelChoiceField, ModelForm
+from django.forms import CharField, ModelChoiceField, ModelForm
 from django.core.exceptions import ValidationError
 from django.contrib import admin
 from django.utils.safestring import mark_safe
 
 from .models import *
+from .utils import looks_like_isbn, normalize_isbn
 
 
 # create a restriction on uploading too small images through the admin form
@@ -16,6 +17,9 @@ class AnyProductAdminForm(ModelForm):
     
     list_display = ("title")
 
+    # room for a hyphenated ISBN, clean_ISBN_13 stores the 13 digits
+    ISBN_13 = CharField(max_length=17, label='International Standard Book Number:')
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # <span_style> turns the code into HTML and renders it according to the tags that are passed
@@ -38,6 +42,12 @@ class AnyProductAdminForm(ModelForm):
 
         return image
 
+    def clean_ISBN_13(self):
+        isbn = normalize_isbn(self.cleaned_data['ISBN_13'])
+        if not looks_like_isbn(isbn):
+            raise ValidationError('Enter a valid ISBN-10 or ISBN-13.')
+        return isbn
+
 # exclude the possibility of providing another choice when determining the category of the corresponding product (for biographies - only biography category, etc.)
 class BiographyAdmin(admin.ModelAdmin):
 
@@ -88,11 +98,46 @@ class NovelAdmin(admin.ModelAdmin):
             return ModelChoiceField(Category.objects.filter(slug='novel'))
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+class OrderLineInline(admin.TabularInline):
+
+    model = OrderLine
+    extra = 0
+    can_delete = False
+    readonly_fields = ('model_name', 'object_id', 'title', 'unit_price', 'quantity', 'final_price')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def move_orders_to(status):
+    previous = Order.STATUS_FLOW[Order.STATUS_FLOW.index(status) - 1]
+    label = dict(Order.STATUS_CHOICES)[status]
+
+    def action(modeladmin, request, queryset):
+        # one UPDATE for the whole selection, orders that are not in the previous status stay where they are
+        moved = queryset.filter(status=previous).update(status=status)
+        modeladmin.message_user(request, '{} orders moved to "{}", {} skipped.'.format(
+            moved, label, queryset.count() - moved
+        ))
+
+    action.__name__ = 'move_to_{}'.format(status)
+    action.short_description = 'Move selected orders to "{}"'.format(label)
+    return action
+
+
+class OrderAdmin(admin.ModelAdmin):
+
+    inlines = [OrderLineInline]
+    list_display = ('id', 'customer', 'status', 'purchase_type', 'order_date', 'cart')
+    list_filter = ('status', 'purchase_type', 'order_date')
+    list_select_related = ('customer__user', 'cart')
+    actions = [move_orders_to(status) for status in Order.STATUS_FLOW[1:]]
+
 admin.site.register(Category)
 admin.site.register(CartProduct)
 admin.site.register(Cart)
 admin.site.register(Customer)
-admin.site.register(Order)
+admin.site.register(Order, OrderAdmin)
 admin.site.register(Biography, BiographyAdmin)
 admin.site.register(Economics, EconomicsAdmin)
 admin.site.register(History, HistoryAdmin)
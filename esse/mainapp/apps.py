@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class MainappConfig(AppConfig):
     name = 'mainapp'
+
+    def ready(self):
+        from .models import PRODUCT_MODELS
+        from .registry import product_types
+        from .search import ensure_search_index
+        from .signals import connect_product_signals
+        from . import tasks  # noqa: F401, registers the job handlers
+        product_types.build(PRODUCT_MODELS)
+        connect_product_signals()
+        post_migrate.connect(ensure_search_index, sender=self, dispatch_uid='ensure_search_index')
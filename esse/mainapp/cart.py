@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from .models import REMOVED_PRODUCT_TITLE
+from .registry import product_types
+
+
+class SessionCartItem:
+
+    def __init__(self, content_object, quantity, unit_price):
+        self.content_object = content_object
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.final_price = unit_price * quantity
+
+    @property
+    def title(self):
+        return self.content_object.title if self.content_object is not None else REMOVED_PRODUCT_TITLE
+
+
+class SessionCart:
+    """Cart of an anonymous visitor, kept in the session until login or registration."""
+
+    SESSION_KEY = 'anonymous_cart'
+
+    id = None
+    owner = None
+    owner_id = None
+    in_order = False
+    for_anonymous_user = True
+
+    def __init__(self, session):
+        self.session = session
+        # "<ct_model>:<product id>" -> {'quantity': int, 'price': str}
+        self.lines = dict(session.get(self.SESSION_KEY, {}))
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @staticmethod
+    def line_key(content_type, product):
+        return '{}:{}'.format(content_type.model, product.id)
+
+    @property
+    def total_products(self):
+        return len(self.lines)
+
+    @property
+    def final_price(self):
+        return sum((Decimal(line['price']) * line['quantity'] for line in self.lines.values()), Decimal('0'))
+
+    def save(self):
+        self.session[self.SESSION_KEY] = self.lines
+
+    def clear(self):
+        self.lines = {}
+        self.session.pop(self.SESSION_KEY, None)
+
+    def add_product(self, content_type, product, quantity=1):
+        self.put_line(content_type, product, quantity)
+        self.save()
+
+    def put_line(self, content_type, product, quantity):
+        line = self.lines.setdefault(self.line_key(content_type, product), {'quantity': 0, 'price': str(product.price)})
+        line['quantity'] += quantity
+
+    def remove_product(self, content_type, product):
+        self.lines.pop(self.line_key(content_type, product), None)
+        self.save()
+
+    def change_quantity(self, content_type, product, quantity):
+        line = self.lines.get(self.line_key(content_type, product))
+        if line is not None:
+            line['quantity'] = quantity
+            self.save()
+
+    def apply_changes(self, changes):
+        for operation, content_type, product, quantity in changes:
+            key = self.line_key(content_type, product)
+            if operation == 'add':
+                self.put_line(content_type, product, quantity)
+            elif operation == 'remove':
+                self.lines.pop(key, None)
+            elif key in self.lines:
+                self.lines[key]['quantity'] = quantity
+        self.save()
+
+    def load_products(self):
+        # one query per product model, not per line
+        ids = {}
+        for key in self.lines:
+            ct_model, object_id = key.split(':')
+            ids.setdefault(ct_model, []).append(int(object_id))
+        products = {}
+        for ct_model, object_ids in ids.items():
+            product_type = product_types.by_ct_model.get(ct_model)
+            if product_type is None:
+                continue
+            for product in product_type.model._base_manager.filter(id__in=object_ids):
+                products['{}:{}'.format(ct_model, product.id)] = product
+        return products
+
+    def items(self):
+        # same shape as Cart.items(), so cart.html and confirmation.html render both cart kinds
+        products = self.load_products()
+        return [
+            SessionCartItem(products.get(key), line['quantity'], Decimal(line['price']))
+            for key, line in self.lines.items()
+        ]
+
+    def merge_into(self, cart):
+        """Moves every line into the customer's database cart, quantities of shared products add up."""
+        products = self.load_products()
+        for key, line in self.lines.items():
+            product = products.get(key)
+            if product is None:
+                continue
+            cart.add_product(product_types.get(product._meta.model_name).content_type, product, line['quantity'])
+        self.clear()
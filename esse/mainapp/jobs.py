@@ -0,0 +1,80 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = 60
+DEFAULT_RETRY_BACKOFF = 10
+DEFAULT_MAX_ATTEMPTS = 5
+
+# job name -> function, filled by register_job (the handlers live in mainapp.tasks)
+handlers = {}
+
+
+def register_job(name):
+    def decorator(func):
+        handlers[name] = func
+        return func
+    return decorator
+
+
+def get_visibility_timeout():
+    return getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', DEFAULT_VISIBILITY_TIMEOUT)
+
+
+def enqueue(name, **payload):
+    """Queues the job once the current transaction commits, nothing is queued when it rolls back."""
+    if name not in handlers:
+        raise ValueError('Unknown job {!r}'.format(name))
+    max_attempts = getattr(settings, 'JOBS_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    transaction.on_commit(lambda: Job.objects.create(name=name, payload=payload, max_attempts=max_attempts))
+
+
+def claimable(now):
+    # a running job whose worker went past its visibility timeout is given to the next worker
+    return Q(status=Job.STATUS_QUEUED, run_at__lte=now) | Q(status=Job.STATUS_RUNNING, locked_until__lt=now)
+
+
+def claim_jobs(limit, visibility_timeout=None):
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    ids = list(Job.objects.filter(claimable(now)).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    # the UPDATE checks the condition again, jobs another worker claimed in the meantime are skipped
+    Job.objects.filter(claimable(now), pk__in=ids).update(
+        status=Job.STATUS_RUNNING, claimed_by=token, attempts=F('attempts') + 1, started_at=now,
+        locked_until=now + timedelta(seconds=visibility_timeout or get_visibility_timeout())
+    )
+    return list(Job.objects.filter(claimed_by=token, status=Job.STATUS_RUNNING).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Runs a claimed job and records the outcome, failures are retried with exponential backoff."""
+    # only the worker holding the claim may record the outcome
+    claim = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by, status=Job.STATUS_RUNNING)
+    try:
+        handlers[job.name](**job.payload)
+    except Exception as error:
+        logger.exception('Job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts)
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            claim.update(status=Job.STATUS_FAILED, finished_at=now, locked_until=None, last_error=repr(error))
+            return False
+        backoff = getattr(settings, 'JOBS_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF) * 2 ** (job.attempts - 1)
+        claim.update(
+            status=Job.STATUS_QUEUED, run_at=now + timedelta(seconds=backoff), locked_until=None,
+            last_error=repr(error)
+        )
+        return False
+    claim.update(status=Job.STATUS_DONE, finished_at=timezone.now(), locked_until=None)
+    return True
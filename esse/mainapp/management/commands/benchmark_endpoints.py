@@ -0,0 +1,156 @@
+import json
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from mainapp import urls as mainapp_urls
+from mainapp.models import CatalogEntry, Category, Customer
+
+
+ORDER_DATA = {
+    'first_name': 'Bench', 'last_name': 'Mark', 'phone': '1111111', 'address': 'Bench street',
+    'purchase_type': 'self', 'order_date': '2021-03-01', 'comment': ''
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Seeds a throwaway test database at several sizes and benchmarks every route of mainapp/urls.py'
+
+    # url name -> (method, needs a logged in customer); every named route of mainapp has to be listed here
+    ROUTES = {
+        'base': ('get', False),
+        'about': ('get', False),
+        'pricing': ('get', False),
+        'library': ('get', False),
+        'books_list': ('get', False),
+        'biography': ('get', False),
+        'economics': ('get', False),
+        'history': ('get', False),
+        'medicine': ('get', False),
+        'novel': ('get', False),
+        'category_detail': ('get', False),
+        'product_detail': ('get', False),
+        'search_results': ('get', False),
+        'login': ('get', False),
+        'registration': ('get', False),
+        'add_to_cart': ('get', True),
+        'change_quantity': ('post', True),
+        'cart': ('get', True),
+        'confirmation': ('get', True),
+        'remove_from_cart': ('get', True),
+        'cart_batch': ('post', True),
+        'profile': ('get', True),
+        'make_order': ('post', True),
+        'profiling_stats': ('get', True),
+        'logout': ('get', True),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000], help='catalog sizes')
+        parser.add_argument('--requests', type=int, default=20, help='requests per route and size')
+        parser.add_argument('--output', default='benchmark.json', help='where to write the JSON results')
+        parser.add_argument('--baseline', default=None, help='earlier JSON results to compare against')
+
+    def handle(self, *args, **options):
+        names = [pattern.name for pattern in mainapp_urls.urlpatterns if getattr(pattern, 'name', None)]
+        unknown = [name for name in names if name not in self.ROUTES]
+        if unknown:
+            raise CommandError('No benchmark plan for routes: {}'.format(', '.join(unknown)))
+        results = {}
+        setup_test_environment()
+        try:
+            for size in options['sizes']:
+                results[str(size)] = self.benchmark_size(size, options['requests'])
+        finally:
+            teardown_test_environment()
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        self.stdout.write('Results written to {}'.format(options['output']))
+        if options['baseline']:
+            self.compare(results, options['baseline'])
+
+    def benchmark_size(self, size, requests):
+        # every size runs in a fresh test database, the configured database is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command('seed_catalog', books=size, customers=max(10, size // 100), seed=size, stdout=self.stdout)
+            customer = Customer.objects.select_related('user').first()
+            customer.user.is_staff = True
+            customer.user.save()
+            entry = CatalogEntry.objects.order_by('id').first()
+            category = Category.objects.get(slug=entry.model_name)
+            product_kwargs = {'ct_model': entry.model_name, 'slug': entry.slug}
+            kwargs = {
+                'category_detail': {'slug': category.slug},
+                'product_detail': product_kwargs,
+                'add_to_cart': product_kwargs,
+                'change_quantity': product_kwargs,
+                'remove_from_cart': product_kwargs,
+            }
+            params = {
+                'search_results': {'q': entry.title.split()[0]},
+                'change_quantity': {'quantity': 2},
+                'make_order': ORDER_DATA,
+                'cart_batch': json.dumps({'operations': [
+                    dict(product_kwargs, op='add'), dict(product_kwargs, op='set_quantity', quantity=3)
+                ]}),
+            }
+            # posted as a raw JSON body instead of form encoded
+            options = {'cart_batch': {'content_type': 'application/json'}}
+            report = {}
+            for name, (method, authenticated) in self.ROUTES.items():
+                client = Client()
+                if authenticated:
+                    client.force_login(customer.user)
+                url = reverse(name, kwargs=kwargs.get(name))
+                timings, queries = [], []
+                for _ in range(requests):
+                    if name in ('change_quantity', 'remove_from_cart'):
+                        client.get(reverse('add_to_cart', kwargs=product_kwargs))
+                    if name == 'logout':
+                        client.force_login(customer.user)
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        response = getattr(client, method)(url, params.get(name, {}), **options.get(name, {}))
+                        timings.append((time.perf_counter() - start) * 1000)
+                    queries.append(len(captured))
+                    if response.status_code >= 400:
+                        raise CommandError('{} answered {}'.format(url, response.status_code))
+                report[name] = {
+                    'requests': requests,
+                    'throughput_rps': round(requests / (sum(timings) / 1000), 1),
+                    'p50_ms': round(percentile(timings, 0.5), 2),
+                    'p90_ms': round(percentile(timings, 0.9), 2),
+                    'p99_ms': round(percentile(timings, 0.99), 2),
+                    'queries': round(statistics.mean(queries), 1),
+                }
+                self.stdout.write('{:>7} {:<18} p50 {p50_ms:>8} ms  p99 {p99_ms:>8} ms  {queries:>5} queries'.format(
+                    size, name, **report[name]
+                ))
+            return report
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def compare(self, results, baseline_path):
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        for size, routes in results.items():
+            for name, report in routes.items():
+                before = baseline.get(size, {}).get(name)
+                if not before:
+                    continue
+                change = (report['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                self.stdout.write('{:>7} {:<18} p50 {:+.1f}%  queries {} -> {}'.format(
+                    size, name, change, before['queries'], report['queries']
+                ))
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from mainapp.models import Cart, CartProduct, CatalogEntry, Customer
+
+
+class Command(BaseCommand):
+    help = 'Fires parallel add_to_cart requests at one cart in a throwaway database and checks the cart after'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=5, help='requests per thread')
+
+    def handle(self, *args, **options):
+        # in-memory SQLite test databases lock whole tables between threads, a file lets writers wait their turn
+        path = os.path.join(tempfile.mkdtemp(), 'burst.sqlite3')
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = path
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command('seed_catalog', books=10, customers=1, cart_size=0, order_ratio=0, stdout=self.stdout)
+            self.burst(options['threads'], options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def burst(self, threads, requests):
+        customer = Customer.objects.select_related('user').get()
+        entry = CatalogEntry.objects.order_by('id').first()
+        url = reverse('add_to_cart', kwargs={'ct_model': entry.model_name, 'slug': entry.slug})
+        barrier = threading.Barrier(threads)
+        failures = []
+
+        def worker():
+            client = Client()
+            client.force_login(customer.user)
+            barrier.wait()
+            try:
+                for _ in range(requests):
+                    response = client.get(url)
+                    if response.status_code != 302:
+                        failures.append(response.status_code)
+            except Exception as error:
+                # the test client re-raises view errors, "database is locked" among them
+                failures.append(repr(error))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        cart = Cart.objects.get(owner=customer, in_order=False)
+        lines = list(CartProduct.objects.filter(cart=cart))
+        self.stdout.write('{} requests, {} failed, {} lines, quantity {}, cart total {}'.format(
+            threads * requests, len(failures), len(lines), sum(line.quantity for line in lines), cart.final_price
+        ))
+        for failure in set(map(str, failures)):
+            self.stderr.write(failure)
+        if failures or len(lines) != 1 or lines[0].quantity != threads * requests:
+            raise CommandError('The burst left the cart inconsistent')
+        if cart.final_price != lines[0].final_price or cart.total_products != 1:
+            raise CommandError('Cart totals drifted from the lines')
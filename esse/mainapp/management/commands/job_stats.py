@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from mainapp.models import Job
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Shows the job queue by status, and throughput and latency of the jobs finished recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='window of finished jobs to measure')
+
+    def handle(self, *args, **options):
+        counts = dict(Job.objects.values_list('status').annotate(Count('id')).order_by())
+        self.stdout.write('  '.join(
+            '{}: {}'.format(label, counts.get(status, 0)) for status, label in Job.STATUS_CHOICES
+        ))
+        since = timezone.now() - timedelta(minutes=options['minutes'])
+        finished = Job.objects.filter(status=Job.STATUS_DONE, finished_at__gte=since)
+        by_name = {}
+        for name, created_at, started_at, finished_at in finished.values_list(
+            'name', 'created_at', 'started_at', 'finished_at'
+        ).iterator():
+            timings = by_name.setdefault(name, ([], []))
+            timings[0].append((started_at - created_at).total_seconds() * 1000)
+            timings[1].append((finished_at - started_at).total_seconds() * 1000)
+        for name, (waits, runs) in sorted(by_name.items()):
+            self.stdout.write(
+                '{:<28} {:>6} done  {:>8.1f}/min  wait p50 {:>8.1f} ms p90 {:>8.1f} ms  '
+                'run p50 {:>8.1f} ms p90 {:>8.1f} ms'.format(
+                    name, len(runs), len(runs) / options['minutes'], percentile(waits, 0.5), percentile(waits, 0.9),
+                    percentile(runs, 0.5), percentile(runs, 0.9)
+                )
+            )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, DecimalField, Sum
+from django.db.models.functions import Coalesce
+
+from mainapp.models import Cart
+
+
+class Command(BaseCommand):
+    help = 'Recomputes cart totals from their lines and fixes the carts that drifted from the incremental updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='only report the drifted carts')
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.annotate(
+            lines_price=Coalesce(
+                Sum('related_products__final_price'), 0, output_field=DecimalField(max_digits=9, decimal_places=2)
+            ),
+            lines_count=Count('related_products')
+        ).only('id', 'final_price', 'total_products').order_by('id')
+        drifted = []
+        for cart in carts.iterator(chunk_size=options['chunk_size']):
+            if cart.final_price != cart.lines_price or cart.total_products != cart.lines_count:
+                cart.final_price, cart.total_products = cart.lines_price, cart.lines_count
+                drifted.append(cart)
+        if not options['dry_run']:
+            Cart.objects.bulk_update(drifted, ['final_price', 'total_products'], batch_size=options['chunk_size'])
+        self.stdout.write('{} {} carts'.format('Found' if options['dry_run'] else 'Repaired', len(drifted)))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from mainapp.models import CartProduct
+
+
+class Command(BaseCommand):
+    help = 'Copies current catalog prices onto the lines of open carts, run it after catalog prices change'
+
+    def handle(self, *args, **options):
+        carts = CartProduct.objects.reprice_open_carts()
+        self.stdout.write('Repriced {} open carts'.format(carts))
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from mainapp.jobs import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (mainapp.jobs) on a thread pool until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='jobs run at the same time, 1 runs them inline')
+        parser.add_argument('--batch', type=int, default=None, help='jobs claimed at once, twice --threads by default')
+        parser.add_argument('--visibility-timeout', type=int, default=None, help='seconds a claimed job stays ours')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        batch = options['batch'] or threads * 2
+        pool = ThreadPoolExecutor(threads) if threads > 1 else None
+        done = failed = 0
+        try:
+            while True:
+                jobs = claim_jobs(batch, options['visibility_timeout'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                results = pool.map(self.run_in_thread, jobs) if pool else map(run_job, jobs)
+                for succeeded in results:
+                    done += succeeded
+                    failed += not succeeded
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write('{} jobs done, {} failed'.format(done, failed))
+
+    @staticmethod
+    def run_in_thread(job):
+        try:
+            return run_job(job)
+        finally:
+            # every pool thread has its own connection, it is not left open between batches
+            connection.close()
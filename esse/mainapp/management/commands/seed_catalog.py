@@ -0,0 +1,158 @@
+import random
+import uuid
+from decimal import Decimal
+from io import BytesIO
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mainapp.models import Category, CatalogEntry, Customer, Cart, CartProduct, Order, OrderLine, PRODUCT_MODELS, Product
+
+
+User = get_user_model()
+
+SEED_COVER = 'seed_cover.jpg'
+WORDS = (
+    'history', 'empire', 'journey', 'silent', 'river', 'market', 'capital', 'heart', 'medicine', 'war',
+    'peace', 'garden', 'night', 'promise', 'truth', 'desert', 'city', 'letters', 'portrait', 'memory'
+)
+AUTHORS = ('Ivan Alexeev', 'Jane Austen', 'George Orwell', 'Yuval Harari', 'Michelle Obama', 'Henry Marsh')
+PUBLISHERS = ('Penguin', 'Vintage', 'HarperCollins', 'Random House', 'Simon & Schuster')
+
+
+def make_isbn(number):
+    isbn = '978' + str(number).zfill(9)[-9:]
+    checksum = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(isbn))
+    return isbn + str((10 - checksum % 10) % 10)
+
+
+class Command(BaseCommand):
+    help = 'Seeds a synthetic catalog with customers, carts and orders (bulk inserts, the catalog is rebuilt after)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000, help='books spread across the product models')
+        parser.add_argument('--customers', type=int, default=100)
+        parser.add_argument('--cart-size', type=int, default=3, help='products in every seeded cart')
+        parser.add_argument('--order-ratio', type=float, default=0.5, help='share of customers with a placed order')
+        parser.add_argument('--seed', type=int, default=None, help='random seed, for repeatable datasets')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        token = uuid.uuid4().hex[:8]
+        with transaction.atomic():
+            products = self.seed_products(options['books'], token, rnd)
+            customers = self.seed_customers(options['customers'], token)
+            carts, orders = self.seed_carts(customers, products, options['cart_size'], options['order_ratio'], rnd)
+            CatalogEntry.objects.rebuild()
+        self.stdout.write(
+            'Seeded {} books, {} customers, {} carts and {} orders'.format(
+                sum(len(items) for items in products.values()), len(customers), carts, orders
+            )
+        )
+
+    def seed_cover(self):
+        if not default_storage.exists(SEED_COVER):
+            buffer = BytesIO()
+            Image.new('RGB', Product.MIN_RESOLUTION, (173, 74, 121)).save(buffer, format='JPEG')
+            default_storage.save(SEED_COVER, ContentFile(buffer.getvalue()))
+        return SEED_COVER
+
+    def seed_products(self, books, token, rnd):
+        cover = self.seed_cover()
+        products = {}
+        for index, product_model in enumerate(PRODUCT_MODELS):
+            model_name = product_model._meta.model_name
+            category, _ = Category.objects.get_or_create(slug=model_name, defaults={'name': model_name.capitalize()})
+            count = books // len(PRODUCT_MODELS) + (1 if index < books % len(PRODUCT_MODELS) else 0)
+            field_names = {field.name for field in product_model._meta.get_fields()}
+            items = []
+            for number in range(count):
+                product = product_model(
+                    category=category,
+                    title=' '.join(rnd.sample(WORDS, 3)).capitalize(),
+                    slug='{}-{}-{}'.format(model_name, token, number),
+                    image=cover,
+                    description='Synthetic book for load testing.',
+                    price=Decimal(rnd.randint(500, 9000)) / 100,
+                    authorship=rnd.choice(AUTHORS),
+                    book_format='Hardcover',
+                    publisher=rnd.choice(PUBLISHERS),
+                    the_year_of_publishing=str(rnd.randint(1950, 2021)),
+                    book_dimensions=str(rnd.randint(100, 900)),
+                    language='English',
+                    appropriate_for_ages='All ages',
+                    ISBN_13=make_isbn(rnd.randint(0, 10 ** 9 - 1)),
+                )
+                if 'theme' in field_names:
+                    product.theme = rnd.choice(WORDS).capitalize()
+                if 'period' in field_names:
+                    product.period = '{} century'.format(rnd.randint(10, 21))
+                items.append(product)
+            # bulk_create skips Product.save (image checks, signals), the catalog is rebuilt afterwards
+            product_model.objects.bulk_create(items, batch_size=500)
+            products[product_model] = list(
+                product_model.objects.filter(slug__startswith='{}-{}-'.format(model_name, token)).only('id', 'price')
+            )
+        return products
+
+    def seed_customers(self, count, token):
+        password = make_password('seed-password')
+        User.objects.bulk_create(
+            [User(username='seed-{}-{}'.format(token, number), password=password) for number in range(count)],
+            batch_size=500
+        )
+        users = User.objects.filter(username__startswith='seed-{}-'.format(token))
+        Customer.objects.bulk_create([Customer(user=user, phone='1111111', address='Seed street') for user in users])
+        return list(Customer.objects.filter(user__username__startswith='seed-{}-'.format(token)))
+
+    def seed_carts(self, customers, products, cart_size, order_ratio, rnd):
+        choices = [(product_model, product) for product_model, items in products.items() for product in items]
+        if not choices:
+            return 0, 0
+        content_types = ContentType.objects.get_for_models(*products.keys())
+        Cart.objects.bulk_create([
+            Cart(owner=customer, in_order=rnd.random() < order_ratio) for customer in customers
+        ])
+        carts = list(Cart.objects.filter(owner__in=customers).order_by('id'))
+        lines, picked = [], []
+        for cart in carts:
+            for product_model, product in rnd.sample(choices, min(cart_size, len(choices))):
+                quantity = rnd.randint(1, 3)
+                picked.append(product)
+                lines.append(CartProduct(
+                    user_id=cart.owner_id, cart=cart, content_type=content_types[product_model],
+                    object_id=product.id, quantity=quantity, unit_price=product.price,
+                    final_price=product.price * quantity
+                ))
+        CartProduct.objects.bulk_create(lines, batch_size=500)
+        totals = {}
+        for line in lines:
+            count, price = totals.get(line.cart_id, (0, Decimal('0')))
+            totals[line.cart_id] = (count + 1, price + line.final_price)
+        for cart in carts:
+            cart.total_products, cart.final_price = totals.get(cart.id, (0, Decimal('0')))
+        Cart.objects.bulk_update(carts, ['total_products', 'final_price'], batch_size=500)
+        orders = [
+            Order(
+                customer_id=cart.owner_id, first_name='Seed', last_name='Customer', phone='1111111',
+                address='Seed street', cart=cart
+            )
+            for cart in carts if cart.in_order
+        ]
+        Order.objects.bulk_create(orders, batch_size=500)
+        order_ids = dict(Order.objects.filter(cart__in=carts).values_list('cart_id', 'id'))
+        OrderLine.objects.bulk_create([
+            OrderLine(
+                order_id=order_ids[line.cart_id], model_name=product.get_model_name(), object_id=product.id,
+                title=product.title, unit_price=line.unit_price, quantity=line.quantity, final_price=line.final_price
+            )
+            for line, product in zip(lines, picked) if line.cart_id in order_ids
+        ], batch_size=500)
+        Customer.objects.recount([customer.id for customer in customers])
+        return len(carts), len(orders)
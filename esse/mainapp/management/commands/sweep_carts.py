@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from mainapp.models import Cart, CartProduct, PRODUCT_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Deletes open carts idle for longer than --days and open cart lines whose product is gone, in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='idle time after which an open cart is deleted')
+        parser.add_argument('--chunk-size', type=int, default=500, help='rows deleted per transaction')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        start = time.perf_counter()
+        carts = self.sweep_carts(cutoff, options['chunk_size'])
+        lines = self.sweep_orphaned_lines(options['chunk_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write('Deleted {} idle carts and {} orphaned lines in {:.2f} s ({:.0f} rows/s)'.format(
+            carts, lines, elapsed, (carts + lines) / elapsed if elapsed else 0
+        ))
+
+    def sweep_carts(self, cutoff, chunk_size):
+        # carts an order points to stay, whatever their flags say
+        idle = Cart.objects.filter(in_order=False, updated_at__lt=cutoff, order__isnull=True)
+        deleted, last_id = 0, 0
+        while True:
+            ids = list(idle.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            # one short transaction per chunk, the SQLite write lock is released between them
+            with transaction.atomic():
+                CartProduct.objects.filter(cart_id__in=ids).delete()
+                deleted += idle.filter(id__in=ids).delete()[1].get(Cart._meta.label, 0)
+            last_id = ids[-1]
+
+    def sweep_orphaned_lines(self, chunk_size):
+        deleted = 0
+        for product_model in PRODUCT_MODELS:
+            # lines of ordered carts are what the order was charged for, only open carts are cleaned up
+            lines = CartProduct.objects.filter(
+                content_type=ContentType.objects.get_for_model(product_model),
+                cart__in_order=False, cart__order__isnull=True
+            ).exclude(object_id__in=product_model._base_manager.values('id'))
+            last_id = 0
+            while True:
+                chunk = list(lines.filter(id__gt=last_id).order_by('id').values_list('id', 'cart_id')[:chunk_size])
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    deleted += CartProduct.objects.filter(id__in=[line_id for line_id, _ in chunk]).delete()[0]
+                    Cart.objects.filter(id__in={cart_id for _, cart_id in chunk}).update_totals()
+                last_id = chunk[-1][0]
+        return deleted
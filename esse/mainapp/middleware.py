@@ -0,0 +1,48 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .profiling import RequestProfile, current_profile, stats
+
+
+logger = logging.getLogger('mainapp.profiling')
+
+
+class QueryProfilingMiddleware:
+    """Records SQL count and time, view and template time and response size for every resolved URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        view_ms = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        url_name = match.view_name if match else 'unresolved'
+        values = {
+            'queries': profile.queries,
+            'sql_ms': profile.sql_time * 1000,
+            'view_ms': view_ms,
+            'template_ms': profile.template_time * 1000,
+            'response_bytes': 0 if response.streaming else len(response.content),
+        }
+        stats.record(url_name, values)
+        if (view_ms > getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500) or
+                profile.queries > getattr(settings, 'PROFILING_SLOW_QUERY_COUNT', 50)):
+            logger.warning(
+                'Slow request %s %s (%s): %d queries, %.1f ms SQL, %.1f ms view, %.1f ms template, %d bytes',
+                request.method, request.path, url_name, values['queries'], values['sql_ms'],
+                values['view_ms'], values['template_ms'], values['response_bytes']
+            )
+        return response
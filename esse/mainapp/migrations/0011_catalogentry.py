@@ -0,0 +1,64 @@
+# Generated by Django 3.1.14 on 2026-10-18 16:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+PRODUCT_MODEL_NAMES = ('biography', 'economics', 'history', 'medicine', 'novel')
+
+
+def fill_catalog(apps, schema_editor):
+    CatalogEntry = apps.get_model('mainapp', 'CatalogEntry')
+    entries = []
+    for model_name in PRODUCT_MODEL_NAMES:
+        for product in apps.get_model('mainapp', model_name).objects.iterator():
+            entries.append(CatalogEntry(
+                model_name=model_name,
+                object_id=product.id,
+                slug=product.slug,
+                title=product.title,
+                price=product.price,
+                image=product.image.name,
+                category_id=product.category_id,
+                authorship=product.authorship,
+                ISBN_13=product.ISBN_13,
+                publisher=product.publisher,
+                subject=getattr(product, 'theme', None) or getattr(product, 'period', None) or ''
+            ))
+    CatalogEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0010_order_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Product type')),
+                ('object_id', models.PositiveIntegerField()),
+                ('slug', models.SlugField()),
+                ('title', models.CharField(max_length=255, verbose_name='Book Title')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Price')),
+                ('image', models.ImageField(upload_to='', verbose_name='Image')),
+                ('authorship', models.CharField(max_length=255, verbose_name='Author:')),
+                ('ISBN_13', models.CharField(max_length=13, verbose_name='International Standard Book Number:')),
+                ('publisher', models.CharField(max_length=255, verbose_name='Publisher:')),
+                ('subject', models.CharField(blank=True, max_length=255, verbose_name='Topic or period:')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='mainapp.category', verbose_name='Category')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['category', 'id'], name='mainapp_cat_categor_32b2dd_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='catalogentry',
+            unique_together={('model_name', 'object_id')},
+        ),
+        migrations.RunPython(fill_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+def count_products(apps, schema_editor):
+    Category = apps.get_model('mainapp', 'Category')
+    CatalogEntry = apps.get_model('mainapp', 'CatalogEntry')
+    counts = dict(CatalogEntry.objects.values_list('category').annotate(models.Count('id')).order_by())
+    for category in Category.objects.all():
+        category.products_count = counts.get(category.id, 0)
+        category.save(update_fields=['products_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0011_catalogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+# external content FTS5 table over the catalog, kept in sync by triggers on every catalog write
+CREATE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE mainapp_catalog_fts USING fts5("
+    "title, ISBN_13, authorship, publisher, subject, "
+    "content='mainapp_catalogentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER mainapp_catalog_fts_ai AFTER INSERT ON mainapp_catalogentry BEGIN "
+    "INSERT INTO mainapp_catalog_fts(rowid, title, ISBN_13, authorship, publisher, subject) "
+    "VALUES (new.id, new.title, new.ISBN_13, new.authorship, new.publisher, new.subject); END",
+    "CREATE TRIGGER mainapp_catalog_fts_ad AFTER DELETE ON mainapp_catalogentry BEGIN "
+    "INSERT INTO mainapp_catalog_fts(mainapp_catalog_fts, rowid, title, ISBN_13, authorship, publisher, subject) "
+    "VALUES ('delete', old.id, old.title, old.ISBN_13, old.authorship, old.publisher, old.subject); END",
+    "CREATE TRIGGER mainapp_catalog_fts_au AFTER UPDATE ON mainapp_catalogentry BEGIN "
+    "INSERT INTO mainapp_catalog_fts(mainapp_catalog_fts, rowid, title, ISBN_13, authorship, publisher, subject) "
+    "VALUES ('delete', old.id, old.title, old.ISBN_13, old.authorship, old.publisher, old.subject); "
+    "INSERT INTO mainapp_catalog_fts(rowid, title, ISBN_13, authorship, publisher, subject) "
+    "VALUES (new.id, new.title, new.ISBN_13, new.authorship, new.publisher, new.subject); END",
+    "INSERT INTO mainapp_catalog_fts(mainapp_catalog_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX = [
+    "DROP TRIGGER IF EXISTS mainapp_catalog_fts_ai",
+    "DROP TRIGGER IF EXISTS mainapp_catalog_fts_ad",
+    "DROP TRIGGER IF EXISTS mainapp_catalog_fts_au",
+    "DROP TABLE IF EXISTS mainapp_catalog_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SEARCH_INDEX:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0012_category_products_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
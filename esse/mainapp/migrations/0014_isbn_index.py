@@ -0,0 +1,64 @@
+# Generated by Django 3.1.14 on 2026-10-18 16:50
+
+import re
+
+from django.db import migrations, models
+
+
+# a copy of mainapp.utils.normalize_isbn as it was when this migration was written
+def normalize_isbn(value):
+    isbn = re.sub(r'[\s-]+', '', value or '').upper()
+    if re.match(r'^\d{9}[\dX]$', isbn):
+        isbn = '978' + isbn[:9]
+        checksum = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(isbn))
+        isbn += str((10 - checksum % 10) % 10)
+    return isbn
+
+
+def normalize_stored_isbns(apps, schema_editor):
+    for model_name in ('biography', 'economics', 'history', 'medicine', 'novel', 'catalogentry'):
+        model = apps.get_model('mainapp', model_name)
+        for pk, isbn in model.objects.values_list('pk', 'ISBN_13'):
+            if normalize_isbn(isbn) != isbn:
+                model.objects.filter(pk=pk).update(ISBN_13=normalize_isbn(isbn))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0013_catalog_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_stored_isbns, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='biography',
+            name='ISBN_13',
+            field=models.CharField(db_index=True, max_length=13, verbose_name='International Standard Book Number:'),
+        ),
+        migrations.AlterField(
+            model_name='catalogentry',
+            name='ISBN_13',
+            field=models.CharField(db_index=True, max_length=13, verbose_name='International Standard Book Number:'),
+        ),
+        migrations.AlterField(
+            model_name='economics',
+            name='ISBN_13',
+            field=models.CharField(db_index=True, max_length=13, verbose_name='International Standard Book Number:'),
+        ),
+        migrations.AlterField(
+            model_name='history',
+            name='ISBN_13',
+            field=models.CharField(db_index=True, max_length=13, verbose_name='International Standard Book Number:'),
+        ),
+        migrations.AlterField(
+            model_name='medicine',
+            name='ISBN_13',
+            field=models.CharField(db_index=True, max_length=13, verbose_name='International Standard Book Number:'),
+        ),
+        migrations.AlterField(
+            model_name='novel',
+            name='ISBN_13',
+            field=models.CharField(db_index=True, max_length=13, verbose_name='International Standard Book Number:'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.14 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0014_isbn_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['model_name', 'id'], name='mainapp_cat_model_n_4da2fd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='catalogentry',
+            index=models.Index(fields=['model_name', 'price', 'id'], name='mainapp_cat_model_n_c22c82_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.14 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+def snapshot_unit_prices(apps, schema_editor):
+    CartProduct = apps.get_model('mainapp', 'CartProduct')
+    lines = list(CartProduct.objects.only('id', 'quantity', 'final_price'))
+    for line in lines:
+        line.unit_price = line.final_price / line.quantity if line.quantity else line.final_price
+    CartProduct.objects.bulk_update(lines, ['unit_price'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0016_product_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartproduct',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=9, null=True, verbose_name='Price per unit'),
+        ),
+        migrations.RunPython(snapshot_unit_prices, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cartproduct',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Price per unit'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    CartProduct = apps.get_model('mainapp', 'CartProduct')
+    Cart = apps.get_model('mainapp', 'Cart')
+    duplicates = (
+        CartProduct.objects.values('cart', 'content_type', 'object_id')
+        .annotate(lines=models.Count('id')).filter(lines__gt=1).order_by()
+    )
+    carts = set()
+    for duplicate in duplicates:
+        lines = list(CartProduct.objects.filter(
+            cart=duplicate['cart'], content_type=duplicate['content_type'], object_id=duplicate['object_id']
+        ).order_by('id'))
+        # the oldest line keeps the summed quantity, the others go
+        kept = lines[0]
+        kept.quantity = sum(line.quantity for line in lines)
+        kept.final_price = kept.unit_price * kept.quantity
+        kept.save(update_fields=['quantity', 'final_price'])
+        CartProduct.objects.filter(id__in=[line.id for line in lines[1:]]).delete()
+        carts.add(duplicate['cart'])
+    for cart in Cart.objects.filter(id__in=carts):
+        totals = CartProduct.objects.filter(cart=cart).aggregate(models.Sum('final_price'), models.Count('id'))
+        cart.final_price = totals['final_price__sum'] or 0
+        cart.total_products = totals['id__count']
+        cart.save(update_fields=['final_price', 'total_products'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0017_cartproduct_unit_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartproduct',
+            constraint=models.UniqueConstraint(fields=('cart', 'content_type', 'object_id'), name='unique_cart_line'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+def link_lines_by_foreign_key(apps, schema_editor):
+    # the ManyToMany membership is what the cart pages showed, lines listed under another cart follow it
+    Cart = apps.get_model('mainapp', 'Cart')
+    CartProduct = apps.get_model('mainapp', 'CartProduct')
+    Membership = Cart.products.through
+    moved = Membership.objects.exclude(cartproduct__cart=models.F('cart')).values_list('cartproduct_id', 'cart_id')
+    affected = set()
+    for line_id, cart_id in moved:
+        line = CartProduct.objects.get(id=line_id)
+        affected.update((line.cart_id, cart_id))
+        # unique_cart_line: a cart that already has the product keeps its own line
+        if not CartProduct.objects.filter(
+            cart_id=cart_id, content_type_id=line.content_type_id, object_id=line.object_id
+        ).exists():
+            CartProduct.objects.filter(id=line_id).update(cart_id=cart_id)
+    # the totals followed the ManyToMany membership, carts on either side of a move are recounted from their lines
+    totals = {
+        row['cart']: row
+        for row in CartProduct.objects.filter(cart__in=affected).values('cart').annotate(
+            count=models.Count('id'), total=models.Sum('final_price')
+        ).order_by()
+    }
+    for cart_id in affected:
+        row = totals.get(cart_id, {})
+        Cart.objects.filter(id=cart_id).update(total_products=row.get('count', 0), final_price=row.get('total') or 0)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0018_unique_cart_line'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_lines_by_foreign_key, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='cart',
+            name='products',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0019_cart_lines_by_foreign_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['in_order', 'updated_at'], name='mainapp_car_in_orde_52164e_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0020_cart_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customer',
+            name='orders',
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def snapshot_placed_orders(apps, schema_editor):
+    Order = apps.get_model('mainapp', 'Order')
+    OrderLine = apps.get_model('mainapp', 'OrderLine')
+    CartProduct = apps.get_model('mainapp', 'CartProduct')
+    CatalogEntry = apps.get_model('mainapp', 'CatalogEntry')
+    # generic relations are not available here, titles come from the catalog read model
+    titles = {
+        (model_name, object_id): title
+        for model_name, object_id, title in CatalogEntry.objects.values_list('model_name', 'object_id', 'title')
+    }
+    carts = dict(Order.objects.filter(cart__isnull=False).values_list('cart_id', 'id'))
+    lines = []
+    for line in CartProduct.objects.filter(cart_id__in=carts).select_related('content_type'):
+        model_name = line.content_type.model
+        lines.append(OrderLine(
+            order_id=carts[line.cart_id], model_name=model_name, object_id=line.object_id,
+            title=titles.get((model_name, line.object_id), 'Removed product'), unit_price=line.unit_price,
+            quantity=line.quantity, final_price=line.final_price
+        ))
+    OrderLine.objects.bulk_create(lines, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0021_drop_customer_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=32, verbose_name='Product type')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Product id')),
+                ('title', models.CharField(max_length=255, verbose_name='Name of book')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Price per unit')),
+                ('quantity', models.PositiveIntegerField()),
+                ('final_price', models.DecimalField(decimal_places=2, max_digits=9, verbose_name='Total cost')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='mainapp.order', verbose_name='Order')),
+            ],
+        ),
+        migrations.RunPython(snapshot_placed_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+def count_orders(apps, schema_editor):
+    Customer = apps.get_model('mainapp', 'Customer')
+    Order = apps.get_model('mainapp', 'Order')
+    totals = {
+        row['customer']: row
+        for row in Order.objects.values('customer').annotate(
+            count=models.Count('id', distinct=True), spend=models.Sum('lines__final_price')
+        ).order_by()
+    }
+    customers = list(Customer.objects.filter(id__in=totals))
+    for customer in customers:
+        customer.orders_count = totals[customer.id]['count']
+        customer.lifetime_spend = totals[customer.id]['spend'] or 0
+    Customer.objects.bulk_update(customers, ['orders_count', 'lifetime_spend'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0022_orderline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='lifetime_spend',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=11),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='orders_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_orders, migrations.RunPython.noop),
+    ]
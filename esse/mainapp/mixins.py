@@ -1,24 +1,46 @@
 from django.views.generic.detail import SingleObjectMixin
 from django.views.generic import View
+from django.utils.functional import SimpleLazyObject
 
-from .models import Category, Cart, Customer, Biography, Economics, History, Medicine, Novel
+from .cart import SessionCart
+from .pagination import paginate_keyset
+from .models import Category, Cart, Customer, CatalogEntry
+from .registry import product_types
 
 class CategoryDetailMixin(SingleObjectMixin):
 
-    CATEGORY_SLUG2PRODUCT_MODEL = {
-        'biography': Biography,
-        'economics': Economics,
-        'history': History,
-        'medicine': Medicine,
-        'novel': Novel
+    # keyset orderings for the category listing, the last field keeps the order stable
+    CATEGORY_PRODUCTS_ORDERING = {
+        'id': ('id',),
+        'price': ('price', 'id')
     }
 
+    def get_object(self, queryset=None):
+        # DetailView and get_context_data both need the object, it is looked up once per request
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
     def get_context_data(self, **kwargs):
-        if isinstance(self.get_object(), Category):
-            model = self.CATEGORY_SLUG2PRODUCT_MODEL[self.get_object().slug]
+        obj = self.get_object()
+        product_type = product_types.for_category(obj) if isinstance(obj, Category) else None
+        if product_type is not None:
+            order = self.request.GET.get('order')
+            if order not in self.CATEGORY_PRODUCTS_ORDERING:
+                order = 'id'
+            page = paginate_keyset(
+                CatalogEntry.objects.filter(model_name=product_type.ct_model),
+                self.CATEGORY_PRODUCTS_ORDERING[order],
+                cursor=self.request.GET.get('cursor')
+            )
             context = super().get_context_data(**kwargs)
             context['categories'] = Category.objects.get_categories_for_left_sidebar()
-            context['category_products'] = model.objects.all()
+            context['category_products'] = page.object_list
+            context['order'] = order
+            context['next_cursor'] = page.next_cursor
+            context['previous_cursor'] = page.previous_cursor
             return context
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.get_categories_for_left_sidebar()
@@ -27,19 +49,69 @@ class CategoryDetailMixin(SingleObjectMixin):
 
 class CartMixin(View):
 
+    # {'user_id', 'customer_id', 'cart_id'} of the open cart, so later requests skip the customer/cart lookups
+    CART_SESSION_KEY = 'cart'
+
     def dispatch(self, request, *args, **kwargs):
-        if request.user.is_authenticated:
-            customer = Customer.objects.filter(user=request.user).first()
-            if not customer:
-                customer = Customer.objects.create(
-                    user=request.user
-                )
-            cart = Cart.objects.filter(owner=customer, in_order=False).first()
-            if not cart:
-                cart = Cart.objects.create(owner=customer)
-        else:
-            cart = Cart.objects.filter(for_anonymous_user=True).first()
-            if not cart:
-                cart = Cart.objects.create(for_anonymous_user=True)
-        self.cart = cart
+        # resolved on first access only, views and templates that never touch the cart pay nothing for it
+        self.customer = SimpleLazyObject(self.get_customer)
+        self.cart = SimpleLazyObject(self.get_cart)
         return super().dispatch(request, *args, **kwargs)
+
+    def get_session_cart(self):
+        session = getattr(self.request, 'session', None)
+        data = session.get(self.CART_SESSION_KEY) if session is not None else None
+        if data and data.get('user_id') == self.request.user.pk:
+            return data
+        return None
+
+    def remember_cart(self, cart):
+        session = getattr(self.request, 'session', None)
+        if session is not None:
+            session[self.CART_SESSION_KEY] = {
+                'user_id': self.request.user.pk, 'customer_id': cart.owner_id, 'cart_id': cart.id
+            }
+
+    def forget_cart(self):
+        session = getattr(self.request, 'session', None)
+        if session is not None:
+            session.pop(self.CART_SESSION_KEY, None)
+
+    def get_customer(self):
+        if not self.request.user.is_authenticated:
+            return None
+        data = self.get_session_cart()
+        if data and data.get('customer_id'):
+            customer = Customer.objects.filter(pk=data['customer_id']).first()
+            if customer:
+                return customer
+        customer = Customer.objects.filter(user=self.request.user).first()
+        if not customer:
+            customer = Customer.objects.create(
+                user=self.request.user
+            )
+        return customer
+
+    def get_cart(self):
+        data = self.get_session_cart() if self.request.user.is_authenticated else None
+        if data:
+            cart = Cart.objects.filter(pk=data['cart_id'], in_order=False).first()
+            if cart:
+                return cart
+        if not self.request.user.is_authenticated:
+            # no database row for anonymous visitors, their cart lives in the session
+            return SessionCart(getattr(self.request, 'session', {}))
+        customer = self.customer
+        cart = Cart.objects.filter(owner=customer, in_order=False).first()
+        if not cart:
+            cart = Cart.objects.create(owner=customer)
+        self.remember_cart(cart)
+        return cart
+
+    def merge_anonymous_cart(self):
+        # called right after login, self.cart is resolved again for the now authenticated user
+        self.customer = SimpleLazyObject(self.get_customer)
+        self.cart = SimpleLazyObject(self.get_cart)
+        session_cart = SessionCart(self.request.session)
+        if session_cart:
+            session_cart.merge_into(self.cart)
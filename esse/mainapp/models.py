@@ -1,17 +1,21 @@
 from PIL import Image
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.db.models.deletion import CASCADE
 from django.urls import reverse
 from django.utils import timezone
 
-User = get_user_model()
+from .utils import normalize_isbn
 
-def get_models_for_count(*model_names):
-    return [models.Count(model_name) for model_name in model_names]
+User = get_user_model()
 
+# shown for cart and order lines whose product was deleted, the line itself is still charged
+REMOVED_PRODUCT_TITLE = 'Removed product'
 
 def get_product_url(obj, viewname):
     ct_model = obj.__class__._meta.model_name
@@ -20,22 +24,29 @@ def get_product_url(obj, viewname):
 
 class LatestProductsManager:
     
-    @staticmethod
-    def get_products_for_main_page(*args, **kwargs):
+    LATEST_PER_MODEL = 5
+
+    @classmethod
+    def get_products_for_main_page(cls, *args, **kwargs):
         with_respect_to = kwargs.get('with_respect_to')
-        products = []
-        ct_models = ContentType.objects.filter(model__in=args)
-        for ct_model in ct_models:
-            model_products = ct_model.model_class()._base_manager.all().order_by('-id')[:5]
-            products.extend(model_products)
-        if with_respect_to:
-            ct_model = ContentType.objects.filter(model=with_respect_to)
-            if ct_model.exists():
-                if with_respect_to in args:
-                    return sorted(
-                        products, key=lambda x: x.__class__._meta.model_name.startswith(with_respect_to), reverse=True
-                    )
-        return products
+        # product model names are known at import time, so no ContentType lookups are needed here
+        model_names = [model_name for model_name in args if model_name in PRODUCT_MODEL_NAMES]
+        if not model_names:
+            return []
+        # one uncorrelated LIMIT per model walks the (model_name, object_id) index from its end, so the cost does
+        # not grow with the catalog; SQLite refuses LIMIT inside a compound SELECT, hence the id__in wrapping
+        parts = [
+            CatalogEntry.objects.filter(
+                id__in=CatalogEntry.objects.filter(model_name=model_name).order_by('-object_id').values('id')[
+                    :cls.LATEST_PER_MODEL
+                ]
+            ).annotate(
+                priority=models.Value(0 if model_name == with_respect_to else 1, output_field=models.IntegerField())
+            )
+            for model_name in model_names
+        ]
+        products = parts[0].union(*parts[1:], all=True)
+        return list(products.order_by('priority', 'model_name', '-object_id'))
 
 
 class MinResolutionErrorException(Exception):
@@ -53,26 +64,40 @@ class LatestProducts:
 
 class CategoryManager(models.Manager):
 
-    CATEGORY_NAME_COUNT_NAME = {
-        'Biography': 'biography__count',
-        'Economics': 'economics__count',
-        'History': 'history__count',
-        'Medicine': 'medicine__count',
-        'Novel': 'novel__count'
-    }
+    SIDEBAR_CACHE_KEY = 'mainapp:sidebar_categories'
+    SIDEBAR_CACHE_TIMEOUT = 60 * 60
 
     def get_queryset(self):
         return super().get_queryset()
 
     def get_categories_for_left_sidebar(self):
-        models = get_models_for_count('biography', 'economics', 'history', 'medicine', 'novel')
-        qs = list(self.get_queryset().annotate(*models))
-        data = [
-            dict(name=c.name, url=c.get_absolute_url(), count=getattr(c, self.CATEGORY_NAME_COUNT_NAME[c.name]))
-            for c in qs
-        ]
+        data = cache.get(self.SIDEBAR_CACHE_KEY)
+        if data is None:
+            data = [
+                dict(name=c.name, url=c.get_absolute_url(), count=c.products_count)
+                for c in self.get_queryset().only('name', 'slug', 'products_count')
+            ]
+            cache.set(self.SIDEBAR_CACHE_KEY, data, self.SIDEBAR_CACHE_TIMEOUT)
         return data
 
+    def invalidate_sidebar(self):
+        # dropped only after commit, so a concurrent request can not cache the old counters again
+        transaction.on_commit(lambda: cache.delete(self.SIDEBAR_CACHE_KEY))
+
+    def change_products_count(self, category_id, delta):
+        self.get_queryset().filter(pk=category_id).update(products_count=models.F('products_count') + delta)
+        self.invalidate_sidebar()
+
+    def recount(self):
+        counts = dict(
+            CatalogEntry.objects.values_list('category').annotate(models.Count('id')).order_by()
+        )
+        categories = list(self.get_queryset())
+        for category in categories:
+            category.products_count = counts.get(category.id, 0)
+        self.bulk_update(categories, ['products_count'])
+        self.invalidate_sidebar()
+
 # **************
 #1 Category
 #2 Product
@@ -82,6 +107,7 @@ class CategoryManager(models.Manager):
 # **************
 #6 Customer
 #7 Specification (author name and etc.)
+#8 CatalogEntry (denormalized copy of every product card)
 
 
 class Category(models.Model):
@@ -89,6 +115,8 @@ class Category(models.Model):
     name = models.CharField(max_length=255, verbose_name='Name of category')
     # URL will display the place where to go after selecting the main category (Library / Novels)
     slug = models.SlugField(unique=True)
+    # number of books in the category, maintained by the product save/delete signals
+    products_count = models.PositiveIntegerField(default=0, editable=False)
     # 
     objects = CategoryManager()
     # how to show categories in admin panel (by the name)
@@ -121,6 +149,8 @@ class Product(models.Model):
     description = models.TextField(verbose_name='Annotation', null = True)
     # max_digits shows max. qty of numerals in product price, and decimal_places - qty of numerals after comma
     price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Price')
+    # bumped on every save, cached product cards are keyed by it
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return self.title
@@ -134,12 +164,30 @@ class Product(models.Model):
             raise MinResolutionErrorException('Uploaded image size does not match the specified requirements!')
         if img.height > max_height or img.width > max_width:
             raise MaxResolutionErrorException('Uploaded image size does not match the specified requirements!')
+        self.ISBN_13 = normalize_isbn(self.ISBN_13)
+        if self.pk:
+            self.version += 1
         super().save(*args, **kwargs)
 
     def get_model_name(self):
         return self.__class__.__name__.lower()
 
 
+class CartProductManager(models.Manager):
+
+    def reprice_open_carts(self):
+        """Copies the current catalog prices onto the lines of open carts, then recomputes those carts' totals."""
+        with transaction.atomic():
+            for product_model in PRODUCT_MODELS:
+                price = Subquery(product_model._base_manager.filter(pk=OuterRef('object_id')).values('price')[:1])
+                # lines of deleted products keep their last price until sweep_carts removes them
+                self.filter(
+                    cart__in_order=False, content_type=ContentType.objects.get_for_model(product_model),
+                    object_id__in=product_model._base_manager.values('id')
+                ).update(unit_price=price, final_price=price * models.F('quantity'))
+            return Cart.objects.filter(in_order=False).update_totals()
+
+
 class CartProduct(models.Model):
 
     # user who will own the item
@@ -152,40 +200,203 @@ class CartProduct(models.Model):
     # creates the relationship of the created product to the cart
     content_object = GenericForeignKey('content_type', 'object_id')
     quantity = models.PositiveIntegerField(default=1)
+    # price of the product when it was added, changing the quantity does not need the product row
+    unit_price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Price per unit')
     final_price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Total cost')
 
+    objects = CartProductManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'content_type', 'object_id'], name='unique_cart_line'),
+        ]
+
     def __str(self):
         return "Product: {}".format(self.content_object.title)
+
+    @property
+    def title(self):
+        return self.content_object.title if self.content_object is not None else REMOVED_PRODUCT_TITLE
     
     def save(self, *args, **kwargs):
-        self.final_price = self.quantity * self.content_object.price
+        if self.unit_price is None:
+            self.unit_price = self.content_object.price
+        self.final_price = self.quantity * self.unit_price
         super().save(*args, **kwargs)
 
     
+class CartQuerySet(models.QuerySet):
+
+    def update_totals(self, **fields):
+        # a single UPDATE recomputes both totals from the lines, so it is right whatever ran before it
+        lines = CartProduct.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return self.update(
+            final_price=Coalesce(Subquery(lines.annotate(total=models.Sum('final_price')).values('total')), 0),
+            total_products=Coalesce(Subquery(lines.annotate(count=models.Count('id')).values('count')), 0),
+            **fields
+        )
+
+
 class Cart(models.Model):
 
     owner = models.ForeignKey('Customer', null=True, verbose_name='Owner', on_delete=CASCADE)
-    products = models.ManyToManyField(CartProduct, blank=True, related_name='related_cart')
     # total_products will show qty of unique products (as an example: 3 same books will show just 1 main product, not 3 separated books)
     total_products = models.PositiveIntegerField(default=0)
     final_price = models.DecimalField(max_digits=9, default=0, decimal_places=2, verbose_name='Total cost')
     in_order = models.BooleanField(default=False)
     for_anonymous_user = models.BooleanField(default=False)
+    # last change of the cart, sweep_carts deletes open carts that sat idle for too long
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['in_order', 'updated_at']),
+        ]
 
     def __str__(self):
         return str(self.id)
 
+    @property
+    def products(self):
+        # lines are linked by CartProduct.cart only, templates and recalc_cart keep using cart.products
+        return self.related_products
+
+    def items(self):
+        # prefetching the generic relation takes one query per product model instead of one per line;
+        # lines of deleted products stay in the list, they are part of the totals and of the order
+        return list(self.related_products.select_related('content_type').prefetch_related('content_object').order_by('id'))
+
+    def lines_for(self, content_type, product):
+        return CartProduct.objects.filter(cart=self, content_type=content_type, object_id=product.id)
+
+    def update_row(self, **fields):
+        # queryset updates skip auto_now, the activity timestamp goes along with every change
+        return Cart.objects.filter(pk=self.pk).update(updated_at=timezone.now(), **fields)
+
+    def apply_totals_delta(self, price_delta, products_delta=0):
+        # F() keeps concurrent mutations of the same cart from overwriting each other's totals
+        self.update_row(
+            final_price=models.F('final_price') + price_delta,
+            total_products=models.F('total_products') + products_delta
+        )
+        self.final_price += price_delta
+        self.total_products += products_delta
+
+    def put_line(self, content_type, product, quantity):
+        """Inserts the line or adds the quantity to the existing one, returns the line only when it was inserted."""
+        # the unique constraint decides between concurrent inserts, there is no read before the write to race on
+        try:
+            with transaction.atomic():
+                cart_product = CartProduct.objects.create(
+                    user_id=self.owner_id, cart=self, content_object=product, quantity=quantity
+                )
+        except IntegrityError:
+            self.lines_for(content_type, product).update(
+                quantity=models.F('quantity') + quantity,
+                final_price=models.F('final_price') + models.F('unit_price') * quantity
+            )
+            return None
+        return cart_product
+
+    def add_product(self, content_type, product, quantity=1):
+        with transaction.atomic():
+            cart_product = self.put_line(content_type, product, quantity)
+            if cart_product is not None:
+                self.apply_totals_delta(cart_product.final_price, 1)
+                return
+            lines = self.lines_for(content_type, product)
+            added = lines.annotate(
+                added=models.ExpressionWrapper(models.F('unit_price') * quantity, output_field=models.DecimalField())
+            ).values('added')[:1]
+            self.update_row(final_price=models.F('final_price') + Coalesce(Subquery(added), 0))
+
+    # add_product on an existing line, remove_product and change_quantity only touch the database totals,
+    # reload the cart to display them
+
+    def remove_product(self, content_type, product):
+        lines = self.lines_for(content_type, product)
+        with transaction.atomic():
+            # the cart row is written before the line is read, so the subtracted amount can not be stale
+            self.update_row(
+                final_price=models.F('final_price') - Coalesce(Subquery(lines.values('final_price')[:1]), 0),
+                total_products=models.F('total_products') - models.Case(
+                    models.When(models.Exists(lines), then=1), default=0, output_field=models.IntegerField()
+                )
+            )
+            lines.delete()
+
+    def change_quantity(self, content_type, product, quantity):
+        lines = self.lines_for(content_type, product)
+        line_price = models.ExpressionWrapper(models.F('unit_price') * quantity, output_field=models.DecimalField())
+        delta = lines.annotate(delta=line_price - models.F('final_price')).values('delta')[:1]
+        with transaction.atomic():
+            self.update_row(final_price=models.F('final_price') + Coalesce(Subquery(delta), 0))
+            lines.update(quantity=quantity, final_price=line_price)
+
+    def apply_changes(self, changes):
+        """Applies (operation, content_type, product, quantity) changes in one transaction, totals are written once."""
+        with transaction.atomic():
+            for operation, content_type, product, quantity in changes:
+                lines = self.lines_for(content_type, product)
+                if operation == 'add':
+                    self.put_line(content_type, product, quantity)
+                elif operation == 'remove':
+                    lines.delete()
+                else:
+                    lines.update(quantity=quantity, final_price=models.F('unit_price') * quantity)
+            self.update_totals()
+
+    def update_totals(self):
+        Cart.objects.filter(pk=self.pk).update_totals(updated_at=timezone.now())
+        self.refresh_from_db(fields=['final_price', 'total_products'])
+
+
+class CustomerManager(models.Manager):
+
+    def record_order(self, customer_id, total):
+        self.get_queryset().filter(pk=customer_id).update(
+            orders_count=models.F('orders_count') + 1, lifetime_spend=models.F('lifetime_spend') + total
+        )
+
+    def recount(self, customer_ids=None):
+        customers = self.get_queryset()
+        if customer_ids is not None:
+            customers = customers.filter(pk__in=customer_ids)
+        customers = list(customers)
+        totals = {
+            row['customer']: row
+            for row in Order.objects.filter(customer__in=customers).values('customer').annotate(
+                count=models.Count('id', distinct=True), spend=models.Sum('lines__final_price')
+            ).order_by()
+        }
+        for customer in customers:
+            row = totals.get(customer.id, {})
+            customer.orders_count = row.get('count', 0)
+            customer.lifetime_spend = row.get('spend') or 0
+        self.bulk_update(customers, ['orders_count', 'lifetime_spend'])
+
 
 class Customer(models.Model):
 
     user = models.ForeignKey(User, verbose_name='User', on_delete=CASCADE)
     phone = models.CharField(max_length=20, verbose_name='Phone number', null=True, blank=True)
     address = models.CharField(max_length=255, verbose_name='Address', null=True, blank=True)
-    orders = models.ManyToManyField('Order', verbose_name='Customer orders', related_name='related_customer')
+    # maintained at checkout, so the profile page does not aggregate the whole order history
+    orders_count = models.PositiveIntegerField(default=0, editable=False)
+    lifetime_spend = models.DecimalField(max_digits=11, decimal_places=2, default=0, editable=False)
+
+    objects = CustomerManager()
 
     def __str__(self):
         return "Customer: {} {}".format(self.user.first_name, self.user.last_name)
 
+    @property
+    def orders(self):
+        # Order.customer is the only link between the two, written with the order itself
+        return self.related_orders
+
 
 class Order(models.Model):
 
@@ -231,10 +442,101 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now=True, verbose_name='Order creating date')
     order_date = models.DateField(verbose_name='Order processing date', default=timezone.now)
 
+    # each status moves to the next one, see the OrderAdmin bulk actions
+    STATUS_FLOW = (STATUS_NEW, STATUS_IN_PROGRESS, STATUS_READY, STATUS_COMPLETED)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'order_date']),
+            models.Index(fields=['customer', 'created_at']),
+        ]
+
     def __str__(self):
         return str(self.id)
 
 
+class OrderLineManager(models.Manager):
+
+    def snapshot(self, order, cart):
+        """Copies every line of the cart into the order with one bulk insert, lines of deleted products included."""
+        # Cart.items() hides lines whose product is gone, but the cart total the customer pays still counts them;
+        # prefetching content_object would also blank content_type and object_id on those lines, so titles are
+        # read with one query per product model instead
+        lines = list(cart.related_products.select_related('content_type').order_by('id'))
+        object_ids = {}
+        for line in lines:
+            object_ids.setdefault(line.content_type, set()).add(line.object_id)
+        titles = {
+            (content_type.model, object_id): title
+            for content_type, ids in object_ids.items()
+            for object_id, title in content_type.model_class()._base_manager.filter(id__in=ids).values_list('id', 'title')
+        }
+        return self.bulk_create([
+            self.model(
+                order=order, model_name=line.content_type.model, object_id=line.object_id,
+                title=titles.get((line.content_type.model, line.object_id), REMOVED_PRODUCT_TITLE),
+                unit_price=line.unit_price, quantity=line.quantity, final_price=line.final_price
+            )
+            for line in lines
+        ])
+
+
+class OrderLine(models.Model):
+    """A cart line as it was at checkout, later catalog changes do not reach it."""
+
+    order = models.ForeignKey(Order, verbose_name='Order', related_name='lines', on_delete=CASCADE)
+    model_name = models.CharField(max_length=32, verbose_name='Product type')
+    object_id = models.PositiveIntegerField(verbose_name='Product id')
+    title = models.CharField(max_length=255, verbose_name='Name of book')
+    unit_price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Price per unit')
+    quantity = models.PositiveIntegerField()
+    final_price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Total cost')
+
+    objects = OrderLineManager()
+
+    def __str__(self):
+        return "{} x {}".format(self.title, self.quantity)
+
+
+class Job(models.Model):
+    """Background work kept in the database and run by the run_jobs command, see mainapp.jobs."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed')
+    )
+
+    name = models.CharField(max_length=100, verbose_name='Job')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # a queued job waits for run_at, a running one belongs to its worker until locked_until
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+
+    def __str__(self):
+        return "{} #{} ({})".format(self.name, self.id, self.status)
+
+
 class Biography(Product):
     
     authorship = models.CharField(max_length=255, verbose_name='Author:')
@@ -244,7 +546,7 @@ class Biography(Product):
     book_dimensions = models.CharField(max_length=10, verbose_name='Quantity of pages:')
     language = models.CharField(max_length=40, verbose_name='Language:')
     appropriate_for_ages = models.CharField(max_length=10, verbose_name='Appropriate for ages:')
-    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:')
+    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:', db_index=True)
 
     def __str__(self):
         return "{} : {}".format(self.category.name, self.title)
@@ -263,7 +565,7 @@ class Economics(Product):
     book_dimensions = models.CharField(max_length=10, verbose_name='Quantity of pages:')
     language = models.CharField(max_length=40, verbose_name='Language:')
     appropriate_for_ages = models.CharField(max_length=10, verbose_name='Appropriate for ages:')
-    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:')
+    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:', db_index=True)
 
     def __str__(self):
         return "{} : {}".format(self.category.name, self.title)
@@ -282,7 +584,7 @@ class History(Product):
     book_dimensions = models.CharField(max_length=10, verbose_name='Quantity of pages:')
     language = models.CharField(max_length=40, verbose_name='Language:')
     appropriate_for_ages = models.CharField(max_length=10, verbose_name='Appropriate for ages:')
-    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:')
+    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:', db_index=True)
 
     def __str__(self):
         return "{} : {}".format(self.category.name, self.title)
@@ -301,7 +603,7 @@ class Medicine(Product):
     book_dimensions = models.CharField(max_length=10, verbose_name='Quantity of pages:')
     language = models.CharField(max_length=40, verbose_name='Language:')
     appropriate_for_ages = models.CharField(max_length=10, verbose_name='Appropriate for ages:')
-    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:')
+    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:', db_index=True)
 
     def __str__(self):
         return "{} : {}".format(self.category.name, self.title)
@@ -319,10 +621,102 @@ class Novel(Product):
     book_dimensions = models.CharField(max_length=10, verbose_name='Quantity of pages:')
     language = models.CharField(max_length=40, verbose_name='Language:')
     appropriate_for_ages = models.CharField(max_length=10, verbose_name='Appropriate for ages:')
-    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:')
+    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:', db_index=True)
 
     def __str__(self):
         return "{} : {}".format(self.category.name, self.title)
     
     def get_absolute_url(self):
         return get_product_url(self, 'product_detail')
+
+
+
+PRODUCT_MODELS = (Biography, Economics, History, Medicine, Novel)
+PRODUCT_MODEL_NAMES = {product_model._meta.model_name: product_model for product_model in PRODUCT_MODELS}
+
+
+class CatalogEntryManager(models.Manager):
+
+    @staticmethod
+    def entry_defaults(product):
+        # theme (economics / medicine) and period (history) are both kept as the subject of the book
+        return dict(
+            slug=product.slug,
+            title=product.title,
+            price=product.price,
+            image=product.image.name,
+            category_id=product.category_id,
+            authorship=product.authorship,
+            ISBN_13=product.ISBN_13,
+            publisher=product.publisher,
+            version=product.version,
+            subject=getattr(product, 'theme', None) or getattr(product, 'period', None) or ''
+        )
+
+    def sync_product(self, product):
+        model_name = product.get_model_name()
+        previous_category_id = self.filter(
+            model_name=model_name, object_id=product.id
+        ).values_list('category_id', flat=True).first()
+        entry, created = self.update_or_create(
+            model_name=model_name, object_id=product.id, defaults=self.entry_defaults(product)
+        )
+        if previous_category_id != product.category_id:
+            if previous_category_id is not None:
+                Category.objects.change_products_count(previous_category_id, -1)
+            Category.objects.change_products_count(product.category_id, 1)
+        return entry, created
+
+    def remove_product(self, product):
+        deleted, _ = self.filter(model_name=product.get_model_name(), object_id=product.id).delete()
+        if deleted:
+            Category.objects.change_products_count(product.category_id, -1)
+        return deleted
+
+    def rebuild(self):
+        # full resync, used after bulk imports that bypass the save/delete signals
+        self.all().delete()
+        entries = [
+            self.model(model_name=product.get_model_name(), object_id=product.id, **self.entry_defaults(product))
+            for product_model in PRODUCT_MODELS
+            for product in product_model._base_manager.iterator()
+        ]
+        entries = self.bulk_create(entries, batch_size=500)
+        Category.objects.recount()
+        return entries
+
+
+class CatalogEntry(models.Model):
+
+    # model name of the product (biography, economics, ...) and its id inside that table
+    model_name = models.CharField(max_length=100, verbose_name='Product type')
+    object_id = models.PositiveIntegerField()
+    slug = models.SlugField()
+    title = models.CharField(max_length=255, verbose_name='Book Title')
+    price = models.DecimalField(max_digits=9, decimal_places=2, verbose_name='Price')
+    image = models.ImageField(verbose_name='Image')
+    category = models.ForeignKey(Category, verbose_name='Category', on_delete=models.CASCADE, related_name='catalog_entries')
+    authorship = models.CharField(max_length=255, verbose_name='Author:')
+    ISBN_13 = models.CharField(max_length=13, verbose_name='International Standard Book Number:', db_index=True)
+    publisher = models.CharField(max_length=255, verbose_name='Publisher:')
+    subject = models.CharField(max_length=255, verbose_name='Topic or period:', blank=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = CatalogEntryManager()
+
+    class Meta:
+        unique_together = ('model_name', 'object_id')
+        indexes = [
+            models.Index(fields=['category', 'id']),
+            models.Index(fields=['model_name', 'id']),
+            models.Index(fields=['model_name', 'price', 'id']),
+        ]
+
+    def __str__(self):
+        return "{} : {}".format(self.model_name, self.title)
+
+    def get_model_name(self):
+        return self.model_name
+
+    def get_absolute_url(self):
+        return reverse('product_detail', kwargs={'ct_model': self.model_name, 'slug': self.slug})
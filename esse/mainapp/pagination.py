@@ -0,0 +1,106 @@
+import base64
+import json
+from binascii import Error as BinasciiError
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 24
+
+
+def get_page_size():
+    return getattr(settings, 'CATALOG_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+
+
+def encode_cursor(direction, values):
+    # direction is 'n' (rows after the key) or 'p' (rows before the key)
+    payload = json.dumps([direction] + [str(value) for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    if not cursor:
+        return None, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None, None
+    if not isinstance(payload, list) or len(payload) != size + 1 or payload[0] not in ('n', 'p'):
+        return None, None
+    return payload[0], payload[1:]
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor('n', self.key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor('p', self.key(self.object_list[0]))
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else '-{}'.format(field) for field in ordering]
+
+
+def keyset_filter(ordering, values, forward=True):
+    # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), a descending field compares the other way
+    condition = Q()
+    for position, field in enumerate(ordering):
+        lookup = 'lt' if forward == field.startswith('-') else 'gt'
+        step = Q(**{'{}__{}'.format(field.lstrip('-'), lookup): values[position]})
+        for previous_field, previous_value in zip(ordering[:position], values[:position]):
+            step &= Q(**{previous_field.lstrip('-'): previous_value})
+        condition |= step
+    return condition
+
+
+def cursor_values(model, ordering, values):
+    # a tampered or stale cursor must not reach the database, it falls back to the first page
+    try:
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value) for field, value in zip(ordering, values)
+        ]
+    except (FieldDoesNotExist, ValidationError, ValueError, TypeError):
+        return None
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=None):
+    """Returns a KeysetPage of the queryset ordered by the ordering fields ('-' descends, the last one must be unique)."""
+    page_size = page_size or get_page_size()
+    direction, values = decode_cursor(cursor, len(ordering))
+    if direction is not None:
+        values = cursor_values(queryset.model, ordering, values)
+        if values is None:
+            direction = None
+    if direction == 'p':
+        queryset = queryset.filter(keyset_filter(ordering, values, forward=False))
+        rows = list(queryset.order_by(*reverse_ordering(ordering))[:page_size + 1])
+        has_previous = len(rows) > page_size
+        return KeysetPage(rows[:page_size][::-1], ordering, has_next=True, has_previous=has_previous)
+    if direction == 'n':
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_next = len(rows) > page_size
+    return KeysetPage(rows[:page_size], ordering, has_next=has_next, has_previous=direction == 'n')
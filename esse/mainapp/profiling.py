@@ -0,0 +1,126 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates
+
+
+# profile of the request being handled, set by QueryProfilingMiddleware
+current_profile = ContextVar('current_profile', default=None)
+
+HISTOGRAM_BUCKETS = {
+    'queries': (1, 2, 5, 10, 20, 50, 100),
+    'sql_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'view_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'template_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'response_bytes': (1024, 10240, 51200, 102400, 512000, 1048576, 5242880),
+}
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    # used as connection.execute_wrapper, so every SQL statement of the request passes through here
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self):
+        labels = ['<={}'.format(bucket) for bucket in self.buckets] + ['>{}'.format(self.buckets[-1])]
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0,
+            'max': round(self.max, 3),
+            'histogram': dict(zip(labels, self.counts)),
+        }
+
+
+class ProfilingStats:
+    """In-process aggregate of request profiles, grouped by URL name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, url_name, values):
+        with self.lock:
+            histograms = self.views.get(url_name)
+            if histograms is None:
+                histograms = self.views[url_name] = {
+                    metric: Histogram(buckets) for metric, buckets in HISTOGRAM_BUCKETS.items()
+                }
+            for metric, value in values.items():
+                histograms[metric].add(value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                url_name: {metric: histogram.as_dict() for metric, histogram in histograms.items()}
+                for url_name, histograms in self.views.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+stats = ProfilingStats()
+
+
+class ProfilingTemplate:
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        profile = current_profile.get()
+        if profile is None:
+            return self.template.render(context, request)
+        # included templates (product cards, ...) are already counted by the outermost render
+        profile.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - start
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """The regular Django template backend, timing every render for QueryProfilingMiddleware."""
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return ProfilingTemplate(super().get_template(template_name))
@@ -0,0 +1,58 @@
+from django.contrib.contenttypes.models import ContentType
+from django.http import Http404
+
+
+class ProductType:
+    """One product model as seen by the urls: ct_model, model class, content type and category slug."""
+
+    def __init__(self, model):
+        self.model = model
+        self.ct_model = model._meta.model_name
+        # every product model has a category of the same slug, see the sidebar and the category pages
+        self.category_slug = self.ct_model
+
+    @property
+    def content_type(self):
+        # tables may not exist yet when the app loads, so the content type is looked up on first use;
+        # ContentTypeManager caches it per database from then on
+        return ContentType.objects.get_for_model(self.model)
+
+    @property
+    def content_type_id(self):
+        return self.content_type.id
+
+    def get_product(self, slug):
+        try:
+            return self.model._base_manager.get(slug=slug)
+        except self.model.DoesNotExist:
+            raise Http404('No {} matches the given slug'.format(self.model._meta.verbose_name))
+
+    def get_products(self, slugs):
+        return {product.slug: product for product in self.model._base_manager.filter(slug__in=slugs)}
+
+
+class ProductRegistry:
+
+    def __init__(self):
+        self.by_ct_model = {}
+        self.by_category_slug = {}
+
+    def build(self, models):
+        self.by_ct_model = {model._meta.model_name: ProductType(model) for model in models}
+        self.by_category_slug = {product_type.category_slug: product_type for product_type in self.by_ct_model.values()}
+
+    def __iter__(self):
+        return iter(self.by_ct_model.values())
+
+    def get(self, ct_model):
+        try:
+            return self.by_ct_model[ct_model]
+        except KeyError:
+            raise Http404('Unknown product type {!r}'.format(ct_model))
+
+    def for_category(self, category):
+        return self.by_category_slug.get(category.slug)
+
+
+# filled by MainappConfig.ready()
+product_types = ProductRegistry()
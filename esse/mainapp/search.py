@@ -0,0 +1,108 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+
+from .models import CatalogEntry
+from .pagination import KeysetPage, decode_cursor, get_page_size, paginate_keyset
+
+
+FTS_TABLE = 'mainapp_catalog_fts'
+SEARCH_ORDERING = ('search_rank', 'id')
+FTS_COLUMNS = 'title, ISBN_13, authorship, publisher, subject'
+FTS_NEW_VALUES = 'new.id, new.title, new.ISBN_13, new.authorship, new.publisher, new.subject'
+FTS_OLD_VALUES = "'delete', old.id, old.title, old.ISBN_13, old.authorship, old.publisher, old.subject"
+
+FTS_TRIGGERS = {
+    'mainapp_catalog_fts_ai': (
+        "CREATE TRIGGER mainapp_catalog_fts_ai AFTER INSERT ON mainapp_catalogentry BEGIN "
+        "INSERT INTO {table}(rowid, {columns}) VALUES ({new}); END"
+    ),
+    'mainapp_catalog_fts_ad': (
+        "CREATE TRIGGER mainapp_catalog_fts_ad AFTER DELETE ON mainapp_catalogentry BEGIN "
+        "INSERT INTO {table}({table}, rowid, {columns}) VALUES ({old}); END"
+    ),
+    'mainapp_catalog_fts_au': (
+        "CREATE TRIGGER mainapp_catalog_fts_au AFTER UPDATE ON mainapp_catalogentry BEGIN "
+        "INSERT INTO {table}({table}, rowid, {columns}) VALUES ({old}); "
+        "INSERT INTO {table}(rowid, {columns}) VALUES ({new}); END"
+    ),
+}
+FTS_TRIGGERS = {
+    name: sql.format(table=FTS_TABLE, columns=FTS_COLUMNS, new=FTS_NEW_VALUES, old=FTS_OLD_VALUES)
+    for name, sql in FTS_TRIGGERS.items()
+}
+
+
+def search_index_available():
+    # the index is created by migration 0013 on SQLite only, other databases fall back to LIKE
+    return connection.vendor == 'sqlite'
+
+
+def ensure_search_index(using='default', **kwargs):
+    # SQLite rebuilds a table on most ALTERs and drops its triggers, so they are restored after every migrate
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if 'mainapp_catalogentry' not in tables or FTS_TABLE not in tables:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'mainapp_catalogentry'"
+        )
+        triggers = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in FTS_TRIGGERS if name not in triggers]
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        if missing:
+            cursor.execute("INSERT INTO {table}({table}) VALUES ('rebuild')".format(table=FTS_TABLE))
+
+
+def build_match_query(query):
+    # every word of the query becomes a quoted prefix term, so user input never reaches the FTS5 syntax
+    words = re.findall(r'\w+', query or '')
+    return ' '.join('"{}"*'.format(word) for word in words)
+
+
+def search_catalog(query, cursor=None, page_size=None):
+    """Returns a KeysetPage of catalog entries matching the query, best matches first."""
+    page_size = page_size or get_page_size()
+    match = build_match_query(query)
+    if not match:
+        return KeysetPage([], SEARCH_ORDERING, has_next=False, has_previous=False)
+    if not search_index_available():
+        words = re.findall(r'\w+', query)
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(title__icontains=word) | Q(ISBN_13__icontains=word) | Q(authorship__icontains=word) |
+                Q(publisher__icontains=word) | Q(subject__icontains=word)
+            )
+        return paginate_keyset(CatalogEntry.objects.filter(condition), ('id',), cursor, page_size)
+    direction, values = decode_cursor(cursor, len(SEARCH_ORDERING))
+    sql = (
+        "SELECT catalog.*, {table}.rank AS search_rank FROM mainapp_catalogentry AS catalog "
+        "JOIN {table} ON {table}.rowid = catalog.id WHERE {table} MATCH %s"
+    )
+    params = [match]
+    if direction:
+        # keyset on (rank, id) instead of OFFSET, so deep pages cost the same as the first one
+        try:
+            rank, pk = float(values[0]), int(values[1])
+        except ValueError:
+            direction = None
+        else:
+            sql += " AND ({table}.rank {operator} %s OR ({table}.rank = %s AND catalog.id {operator} %s))"
+            params += [rank, rank, pk]
+    sql += " ORDER BY {table}.rank {order}, catalog.id {order} LIMIT %s"
+    params.append(page_size + 1)
+    sql = sql.format(
+        table=FTS_TABLE, operator='<' if direction == 'p' else '>', order='DESC' if direction == 'p' else 'ASC'
+    )
+    rows = list(CatalogEntry.objects.raw(sql, params))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'p':
+        return KeysetPage(rows[::-1], SEARCH_ORDERING, has_next=True, has_previous=has_more)
+    return KeysetPage(rows, SEARCH_ORDERING, has_next=has_more, has_previous=direction == 'n')
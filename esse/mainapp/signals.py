@@ -0,0 +1,31 @@
+from django.db.models.signals import post_save, post_delete
+
+from .models import Category, CatalogEntry, Customer, Order, PRODUCT_MODELS
+
+
+def sync_catalog_entry(sender, instance, raw=False, **kwargs):
+    # fixtures are loaded with raw=True, the catalog is rebuilt separately in that case
+    if raw:
+        return
+    CatalogEntry.objects.sync_product(instance)
+
+
+def remove_catalog_entry(sender, instance, **kwargs):
+    CatalogEntry.objects.remove_product(instance)
+
+
+def invalidate_category_sidebar(sender, **kwargs):
+    Category.objects.invalidate_sidebar()
+
+
+def recount_customer_orders(sender, instance, **kwargs):
+    Customer.objects.recount([instance.customer_id])
+
+
+def connect_product_signals():
+    post_save.connect(invalidate_category_sidebar, sender=Category, dispatch_uid='sidebar_category_save')
+    post_delete.connect(invalidate_category_sidebar, sender=Category, dispatch_uid='sidebar_category_delete')
+    post_delete.connect(recount_customer_orders, sender=Order, dispatch_uid='customer_orders_delete')
+    for product_model in PRODUCT_MODELS:
+        post_save.connect(sync_catalog_entry, sender=product_model, dispatch_uid='catalog_save_{}'.format(product_model.__name__))
+        post_delete.connect(remove_catalog_entry, sender=product_model, dispatch_uid='catalog_delete_{}'.format(product_model.__name__))
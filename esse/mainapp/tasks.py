@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.mail import mail_managers, send_mail
+
+from .jobs import register_job
+from .models import Customer, Order
+
+
+def describe_order(order):
+    lines = ['{} x {}: {} USD'.format(line.title, line.quantity, line.final_price) for line in order.lines.all()]
+    return '\n'.join(lines + ['', 'Total: {} USD'.format(sum(line.final_price for line in order.lines.all()))])
+
+
+def get_order(order_id):
+    return Order.objects.select_related('customer__user').prefetch_related('lines').filter(pk=order_id).first()
+
+
+@register_job('send_order_confirmation')
+def send_order_confirmation(order_id):
+    order = get_order(order_id)
+    if order is None or not order.customer.user.email:
+        return
+    send_mail(
+        'Esse Book Store: order #{}'.format(order.id),
+        'Thanks for your order!\n\n{}'.format(describe_order(order)),
+        settings.DEFAULT_FROM_EMAIL,
+        [order.customer.user.email]
+    )
+
+
+@register_job('notify_manager')
+def notify_manager(order_id):
+    order = get_order(order_id)
+    if order is None:
+        return
+    mail_managers(
+        'New order #{}'.format(order.id),
+        'Call {} {} at {}.\n\n{}'.format(order.first_name, order.last_name, order.phone, describe_order(order))
+    )
+
+
+@register_job('recount_customer_orders')
+def recount_customer_orders(customer_id):
+    # checkout already incremented the rollup, the recount only repairs drift and is safe to retry
+    Customer.objects.recount([customer_id])
@@ -0,0 +1,31 @@
+from django import template
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+register = template.Library()
+
+# cards are keyed by the product version, so stale entries simply stop being read; the 'cards' alias is per process
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(template_name, product):
+    return 'product_card:{}:{}:{}:{}'.format(template_name, product.model_name, product.object_id, product.version)
+
+
+@register.simple_tag
+def product_cards(products, template_name):
+    """Renders a card for every catalog entry, reusing cached fragments with one cache round-trip."""
+    products = list(products)
+    keys = [card_cache_key(template_name, product) for product in products]
+    cache = caches['cards']
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, product in zip(keys, products):
+        if key not in cards:
+            missing[key] = render_to_string(template_name, {'product': product})
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return mark_safe(''.join(cards[key] for key in keys))
@@ -1,11 +1,33 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 from decimal import Decimal
+from datetime import timedelta
 from unittest import mock
-from django.test import TestCase, RequestFactory
+from PIL import Image
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.core import mail
+from django.core.cache import cache, caches
+from django.utils import timezone
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.forms import modelform_factory
 
-from .models import Category, Biography, CartProduct, Cart, Customer
-from .views import recalc_cart, AddToCartView, test_view
+from .models import Category, Biography, History, CartProduct, Cart, Customer, CatalogEntry, LatestProducts, Order, OrderLine, Job
+from .views import AddToCartView, MakeOrderView, SearchResultsView, ProductDetailView, test_view
+from .utils import normalize_isbn, recalc_cart
+from .admin import AnyProductAdminForm
+from .search import search_catalog
+from .pagination import encode_cursor, paginate_keyset
+from .templatetags.product_cards import product_cards
+from .profiling import stats
+from .registry import product_types
+from .jobs import claim_jobs, handlers, run_job
 
 User = get_user_model()
 
@@ -15,12 +37,34 @@ small_gif = (
     b'\x02\x4c\x01\x00\x3b'
 )
 
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# the query counts below are about the catalog tables, the shared database cache would add its own reads
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'esse-tests'},
+    'cards': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'esse-tests-cards'},
+}
+
+
+def make_image(name='cover.jpg', size=Biography.MIN_RESOLUTION):
+    # products refuse images below MIN_RESOLUTION, so the fixtures need a real cover
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=LOCMEM_CACHES)
 class StoreTestCases(TestCase):
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self) -> None:
         self.user = User.objects.create(username='testuser', password='password')
         self.category = Category.objects.create(name='Biography', slug='biographys')
-        image = SimpleUploadedFile("small.gif", small_gif, content_type='img/gif')
+        image = make_image()
         self.biography = Biography.objects.create(
             category=self.category,
             title="Test Biography",
@@ -44,6 +88,16 @@ class StoreTestCases(TestCase):
             content_object=self.biography
         )
     
+    def test_cart_products_follows_the_foreign_key(self):
+        other = Cart.objects.create(owner=self.customer)
+        line = CartProduct.objects.create(user=self.customer, cart=other, content_object=self.biography)
+        self.assertEqual(list(self.cart.products.all()), [self.cart_product])
+        self.assertEqual(list(other.products.all()), [line])
+        self.cart_product.delete()
+        CartProduct.objects.filter(pk=line.pk).update(cart=self.cart)
+        self.assertEqual(list(self.cart.products.all()), [line])
+        self.assertFalse(other.products.exists())
+
     def test_add_to_cart(self):
         self.cart.products.add(self.cart_product)
         recalc_cart(self.cart)
@@ -58,4 +112,507 @@ class StoreTestCases(TestCase):
         response = AddToCartView.as_view()(request, ct_model='biography', slug='test-slug')
         self.assertEqual(response.status_code, 302)
         self.assertEqual(response.url, '/cart/')
-    
\ No newline at end of file
+
+    def test_catalog_entry_follows_product(self):
+        entry = CatalogEntry.objects.get(model_name='biography', object_id=self.biography.id)
+        self.assertEqual(entry.title, 'Test Biography')
+        self.assertEqual(entry.get_absolute_url(), self.biography.get_absolute_url())
+        self.biography.price = Decimal('10.00')
+        self.biography.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.price, Decimal('10.00'))
+        self.biography.delete()
+        self.assertFalse(CatalogEntry.objects.exists())
+
+    def test_latest_products_in_one_query(self):
+        History.objects.create(
+            category=self.category, title="Test History", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        with CaptureQueriesContext(connection) as captured:
+            products = LatestProducts.objects.get_products_for_main_page(
+                'biography', 'economics', 'history', 'medicine', 'novel', with_respect_to='history'
+            )
+        self.assertEqual([product.title for product in products], ['Test History', 'Test Biography'])
+        self.assertEqual(len(captured), 1)
+        # a subquery correlated with the outer rows would run once per catalog entry
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + captured[0]['sql'])
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertNotIn('CORRELATED', plan)
+
+    def test_sidebar_counters(self):
+        Biography.objects.create(
+            category=self.category, title="Second Biography", slug="second-slug", image=make_image(),
+            price=Decimal('10.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        # TestCase never commits, so drop the cached sidebar by hand
+        cache.clear()
+        with self.assertNumQueries(1):
+            categories = Category.objects.get_categories_for_left_sidebar()
+        self.assertEqual(categories[0]['count'], 2)
+        with self.assertNumQueries(0):
+            Category.objects.get_categories_for_left_sidebar()
+
+    def test_search_ranks_products_from_every_model(self):
+        category = Category.objects.create(name='History', slug='history')
+        History.objects.create(
+            category=category, title="Alexeev and the Empire", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='Someone Else', book_format='B', publisher='Test Publishing House',
+            the_year_of_publishing='2021', book_dimensions='1', language='English', appropriate_for_ages='All',
+            period='Modern', ISBN_13='9780000000003'
+        )
+        with self.assertNumQueries(1):
+            titles = [product.title for product in search_catalog('alexeev')]
+        self.assertEqual(sorted(titles), ['Alexeev and the Empire', 'Test Biography'])
+        self.assertEqual([product.title for product in search_catalog('modern')], ['Alexeev and the Empire'])
+        self.assertEqual(len(search_catalog('"*')), 0)
+        first_page = search_catalog('alexeev', page_size=1)
+        second_page = search_catalog('alexeev', cursor=first_page.next_cursor, page_size=1)
+        self.assertEqual(len(second_page), 1)
+        self.assertNotEqual(first_page.object_list[0].id, second_page.object_list[0].id)
+        self.assertFalse(second_page.has_next)
+        back = search_catalog('alexeev', cursor=second_page.previous_cursor, page_size=1)
+        self.assertEqual(back.object_list[0].id, first_page.object_list[0].id)
+
+    def test_isbn_normalization(self):
+        self.assertEqual(normalize_isbn('978-0-306-40615-7'), '9780306406157')
+        self.assertEqual(normalize_isbn('0 306 40615 2'), '9780306406157')
+        self.biography.ISBN_13 = '0-306-40615-2'
+        self.biography.save()
+        self.assertEqual(CatalogEntry.objects.get().ISBN_13, '9780306406157')
+        form = modelform_factory(Biography, form=AnyProductAdminForm, fields=('title', 'image', 'ISBN_13'))(
+            data={'title': 'Test Biography', 'ISBN_13': '978-0-306-40615-7'}
+        )
+        form.is_valid()
+        self.assertNotIn('ISBN_13', form.errors)
+        self.assertEqual(form.cleaned_data['ISBN_13'], '9780306406157')
+
+    def test_isbn_search_redirects_to_product(self):
+        request = RequestFactory().get('/search/', {'q': '1234-5678-97777'})
+        with self.assertNumQueries(1):
+            response = SearchResultsView.as_view()(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, self.biography.get_absolute_url())
+
+    def test_keyset_pagination_by_price(self):
+        for number in range(3):
+            Biography.objects.create(
+                category=self.category, title="Book {}".format(number), slug="book-{}".format(number), image=make_image(),
+                price=Decimal('10.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+                book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='978000000000{}'.format(number)
+            )
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_keyset(CatalogEntry.objects.all(), ('price', 'id'), cursor=cursor, page_size=2)
+            seen.extend(entry.title for entry in page)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        self.assertEqual(seen, ['Book 0', 'Book 1', 'Book 2', 'Test Biography'])
+
+    def test_bad_cursor_values_fall_back_to_first_page(self):
+        cursor = encode_cursor('n', ['not-a-price', 'not-an-id'])
+        page = paginate_keyset(CatalogEntry.objects.all(), ('price', 'id'), cursor=cursor, page_size=2)
+        self.assertEqual([entry.title for entry in page], ['Test Biography'])
+        for url in ('/library/biographys/', '/library/biographys/?order=price'):
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/profile/', {'cursor': encode_cursor('n', ['yesterday', 'x'])}).status_code, 200)
+
+    def test_product_cards_follow_product_version(self):
+        caches['cards'].clear()
+        html = product_cards(CatalogEntry.objects.all(), 'product_card_category.html')
+        self.assertIn('Test Biography', html)
+        entries = list(CatalogEntry.objects.all())
+        with self.assertNumQueries(0):
+            self.assertEqual(product_cards(entries, 'product_card_category.html'), html)
+        self.biography.title = 'Renamed Biography'
+        self.biography.save()
+        self.assertIn('Renamed Biography', product_cards(CatalogEntry.objects.all(), 'product_card_category.html'))
+
+    def test_product_detail_loads_category_with_product(self):
+        request = RequestFactory().get('')
+        request.user = self.user
+        Category.objects.get_categories_for_left_sidebar()
+        # the cart is never touched by the product page, so only the product itself is queried
+        with self.assertNumQueries(1):
+            response = ProductDetailView.as_view()(request, ct_model='biography', slug='test-slug')
+            response.render()
+        self.assertContains(response, 'Test Biography')
+
+    def test_profiling_stats_per_view(self):
+        stats.reset()
+        self.client.get('/search/', {'q': 'biography'})
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.client.force_login(staff)
+        data = self.client.get('/profiling/').json()
+        self.assertEqual(data['search_results']['queries']['count'], 1)
+        self.assertGreater(data['search_results']['response_bytes']['max'], 0)
+        self.assertGreater(data['search_results']['template_ms']['max'], 0)
+        self.client.logout()
+        self.assertEqual(self.client.get('/profiling/').status_code, 302)
+
+    def test_seed_catalog(self):
+        call_command('seed_catalog', books=12, customers=4, order_ratio=1, seed=1, stdout=StringIO())
+        self.assertEqual(CatalogEntry.objects.count(), 13)
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertEqual(OrderLine.objects.count(), 12)
+        self.assertEqual(sum(Category.objects.values_list('products_count', flat=True)), 13)
+        self.assertTrue(len(search_catalog(CatalogEntry.objects.last().title)))
+
+    def test_cart_is_resolved_from_session(self):
+        self.client.force_login(self.user)
+        self.client.get('/cart/')
+        self.assertEqual(self.client.session['cart']['cart_id'], self.cart.id)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/cart/')
+        self.assertFalse([query for query in captured if 'mainapp_customer' in query['sql']])
+
+    def test_anonymous_cart_lives_in_session_until_registration(self):
+        self.client.get('/add_to_cart/biography/test-slug/')
+        self.assertFalse(Cart.objects.filter(for_anonymous_user=True).exists())
+        self.assertEqual(self.client.session['anonymous_cart'], {
+            'biography:{}'.format(self.biography.id): {'quantity': 1, 'price': '50000.00'}
+        })
+        self.client.post('/registration/', {
+            'username': 'newcustomer', 'password': 'secret-pass', 'confirm_password': 'secret-pass',
+            'first_name': 'New', 'last_name': 'Customer', 'address': '', 'phone': '', 'email': 'new@example.com'
+        })
+        cart = Cart.objects.get(owner__user__username='newcustomer', in_order=False)
+        self.assertEqual(cart.total_products, 1)
+        self.assertEqual(cart.final_price, Decimal('50000.00'))
+        self.assertNotIn('anonymous_cart', self.client.session)
+
+    def test_cart_totals_follow_lines(self):
+        history = History.objects.create(
+            category=self.category, title="Test History", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        cart = Cart.objects.create(owner=self.customer)
+        history_type = ContentType.objects.get_for_model(History)
+        cart.add_product(history_type, history)
+        cart.add_product(history_type, history)
+        cart.refresh_from_db()
+        self.assertEqual((cart.total_products, cart.final_price), (1, Decimal('40.00')))
+        # a stale copy of the cart must not overwrite the totals written through another one
+        stale = Cart.objects.get(pk=cart.pk)
+        cart.add_product(ContentType.objects.get_for_model(Biography), self.biography)
+        stale.change_quantity(history_type, history, 3)
+        cart.refresh_from_db()
+        self.assertEqual((cart.total_products, cart.final_price), (2, Decimal('50060.00')))
+        stale.remove_product(history_type, history)
+        stale.remove_product(history_type, history)
+        cart.refresh_from_db()
+        self.assertEqual((cart.total_products, cart.final_price), (1, Decimal('50000.00')))
+        Cart.objects.filter(pk=cart.pk).update(final_price=0)
+        out = StringIO()
+        call_command('repair_cart_totals', stdout=out)
+        cart.refresh_from_db()
+        self.assertEqual(cart.final_price, Decimal('50000.00'))
+        self.assertIn('Repaired 2 carts', out.getvalue())
+
+    def test_cart_renders_in_constant_queries(self):
+        self.client.force_login(self.user)
+        history_type = ContentType.objects.get_for_model(History)
+        queries = []
+        for number in range(10):
+            history = History.objects.create(
+                category=self.category, title="History {}".format(number), slug="history-{}".format(number),
+                image=make_image(), price=Decimal('20.00'), authorship='A', book_format='B', publisher='P',
+                the_year_of_publishing='2021', book_dimensions='1', language='English', appropriate_for_ages='All',
+                ISBN_13='978000000000{}'.format(number)
+            )
+            self.cart.add_product(history_type, history)
+            if number in (4, 9):
+                self.client.get('/cart/')
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.client.get('/cart/')
+                queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+        self.assertContains(response, 'History 9')
+
+    def test_product_types_resolve_without_content_type_queries(self):
+        # the fixture line bypasses the cart totals, start from an empty cart
+        self.cart_product.delete()
+        self.client.force_login(self.user)
+        self.client.get('/add_to_cart/biography/test-slug/')
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get('/remove_from_cart/biography/test-slug/')
+        self.assertFalse([query for query in captured if 'django_content_type' in query['sql']])
+        self.assertEqual(product_types.get('history').model, History)
+        self.assertEqual(self.client.get('/add_to_cart/poetry/test-slug/').status_code, 404)
+
+    def test_cart_batch_applies_operations_at_once(self):
+        self.cart_product.delete()
+        History.objects.create(
+            category=self.category, title="Test History", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        operations = [
+            {'op': 'add', 'ct_model': 'biography', 'slug': 'test-slug'},
+            {'op': 'add', 'ct_model': 'history', 'slug': 'history-slug'},
+            {'op': 'set_quantity', 'ct_model': 'history', 'slug': 'history-slug', 'quantity': 3},
+            {'op': 'remove', 'ct_model': 'biography', 'slug': 'test-slug'},
+        ]
+        for login in (False, True):
+            if login:
+                self.client.force_login(self.user)
+            response = self.client.post('/cart/batch/', {'operations': operations}, content_type='application/json')
+            self.assertEqual(response.json(), {
+                'total_products': 1, 'final_price': '60.00', 'lines': [
+                    {'ct_model': 'history', 'slug': 'history-slug', 'title': 'Test History', 'quantity': 3,
+                     'final_price': '60.00'}
+                ]
+            })
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_products, self.cart.final_price), (1, Decimal('60.00')))
+        response = self.client.post(
+            '/cart/batch/', {'operations': [{'op': 'add', 'ct_model': 'poetry', 'slug': 'x'}]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_quantity_changes_use_the_price_snapshot(self):
+        self.cart_product.delete()
+        biography_type = ContentType.objects.get_for_model(Biography)
+        self.cart.add_product(biography_type, self.biography)
+        Biography.objects.filter(pk=self.biography.pk).update(price=Decimal('10.00'))
+        with CaptureQueriesContext(connection) as captured:
+            self.cart.change_quantity(biography_type, self.biography, 2)
+        self.assertFalse([query for query in captured if 'mainapp_biography' in query['sql']])
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.final_price, Decimal('100000.00'))
+        # a line whose product was deleted does not stop the other lines from being repriced
+        history = History.objects.create(
+            category=self.category, title="Test History", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        self.cart.add_product(ContentType.objects.get_for_model(History), history)
+        History.objects.filter(pk=history.pk).delete()
+        out = StringIO()
+        call_command('reprice_carts', stdout=out)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.final_price, Decimal('40.00'))
+        self.assertEqual(CartProduct.objects.get(cart=self.cart, content_type=biography_type).unit_price, Decimal('10.00'))
+        self.assertIn('Repriced 1 open carts', out.getvalue())
+
+    def test_add_to_cart_increments_the_one_line(self):
+        self.cart_product.delete()
+        self.client.force_login(self.user)
+        self.client.get('/add_to_cart/biography/test-slug/')
+        # a second request with its own copy of the cart goes through the conflict path
+        Cart.objects.get(pk=self.cart.pk).add_product(ContentType.objects.get_for_model(Biography), self.biography, 2)
+        line = CartProduct.objects.get(cart=self.cart)
+        self.assertEqual((line.quantity, line.final_price), (3, Decimal('150000.00')))
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_products, self.cart.final_price), (1, Decimal('150000.00')))
+
+    def test_sweep_carts_keeps_active_and_ordered_carts(self):
+        idle = Cart.objects.create(owner=self.customer)
+        ordered = Cart.objects.create(owner=self.customer, in_order=True)
+        CartProduct.objects.create(user=self.customer, cart=idle, content_object=self.biography)
+        Cart.objects.filter(pk__in=[idle.pk, ordered.pk]).update(updated_at=timezone.now() - timedelta(days=60))
+        orphan_history = History.objects.create(
+            category=self.category, title="Test History", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        self.cart.add_product(ContentType.objects.get_for_model(History), orphan_history)
+        placed = Cart.objects.create(owner=self.customer)
+        placed.add_product(ContentType.objects.get_for_model(History), orphan_history)
+        Cart.objects.filter(pk=placed.pk).update(in_order=True)
+        Order.objects.create(customer=self.customer, first_name='A', last_name='B', phone='1', cart=placed)
+        History.objects.filter(pk=orphan_history.pk).delete()
+        out = StringIO()
+        call_command('sweep_carts', days=30, chunk_size=1, stdout=out)
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {self.cart.pk, ordered.pk, placed.pk})
+        self.assertEqual(
+            list(CartProduct.objects.order_by('id').values_list('cart', flat=True)), [self.cart.pk, placed.pk]
+        )
+        # the placed order keeps its line and its total
+        placed.refresh_from_db()
+        self.assertEqual((placed.total_products, placed.final_price), (1, Decimal('20.00')))
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.total_products, self.cart.final_price), (1, Decimal('50000.00')))
+        self.assertIn('Deleted 1 idle carts and 1 orphaned lines', out.getvalue())
+
+    def test_checkout_writes_once_and_only_once(self):
+        User.objects.filter(pk=self.user.pk).update(email='test@example.com')
+        history = History.objects.create(
+            category=self.category, title="Test History", slug="history-slug", image=make_image(),
+            price=Decimal('20.00'), authorship='A', book_format='B', publisher='P', the_year_of_publishing='2021',
+            book_dimensions='1', language='English', appropriate_for_ages='All', ISBN_13='9780000000002'
+        )
+        self.cart.add_product(ContentType.objects.get_for_model(History), history)
+        History.objects.filter(pk=history.pk).delete()
+        self.client.force_login(self.user)
+        # the line of the deleted book is listed, so the lines add up to the total the customer confirms
+        self.assertContains(self.client.get('/cart/'), 'Removed product')
+        confirmation = self.client.get('/confirmation/')
+        self.assertContains(confirmation, 'Removed product')
+        self.assertContains(confirmation, '<td>20.00 USD</td>')
+        data = {
+            'first_name': 'Test', 'last_name': 'Customer', 'phone': '1111111', 'address': 'Address',
+            'purchase_type': 'self', 'order_date': '2021-03-01', 'comment': ''
+        }
+        # TestCase never commits, the on_commit hooks of the checkout run right away instead
+        with CaptureQueriesContext(connection) as captured, mock.patch(
+            'mainapp.jobs.transaction.on_commit', side_effect=lambda func: func()
+        ):
+            response = self.client.post('/make_order/', data)
+        self.assertEqual(response.url, '/')
+        writes = [
+            query['sql'].split()[0] for query in captured
+            if query['sql'].startswith(('INSERT', 'UPDATE')) and '"mainapp_' in query['sql']
+        ]
+        # cart flip, order, order lines, customer rollup, then the three queued jobs
+        self.assertEqual(writes, ['UPDATE', 'INSERT', 'INSERT', 'UPDATE', 'INSERT', 'INSERT', 'INSERT'])
+        order = Order.objects.get()
+        self.assertEqual((order.customer, order.cart), (self.customer, self.cart))
+        Biography.objects.filter(pk=self.biography.pk).update(title='Renamed')
+        # the line of the deleted history book is paid for as well, under a placeholder title
+        self.assertEqual(
+            list(order.lines.order_by('id').values_list('model_name', 'object_id', 'title', 'quantity', 'final_price')),
+            [
+                ('biography', self.biography.id, 'Test Biography', 1, Decimal('50000.00')),
+                ('history', history.id, 'Removed product', 1, Decimal('20.00'))
+            ]
+        )
+        self.assertEqual(list(self.customer.orders.all()), [order])
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_QUEUED).count(), 3)
+        # the profile shows the order before any worker ran
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.orders_count, 1)
+        self.assertNotContains(self.client.get('/profile/'), 'You have no orders yet')
+        call_command('run_jobs', threads=1, once=True, stdout=StringIO())
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_DONE).count(), 3)
+        self.assertEqual(mail.outbox[0].to, ['test@example.com'])
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.orders_count, self.customer.lifetime_spend), (1, Decimal('50020.00')))
+        # a second tab that resolved the cart before the first checkout is turned away
+        with mock.patch.object(MakeOrderView, 'get_cart', return_value=self.cart):
+            response = self.client.post('/make_order/', data)
+        self.assertEqual(response.url, '/cart/')
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(CATALOG_PAGE_SIZE=2)
+    def test_profile_pages_through_orders(self):
+        for number in range(3):
+            cart = Cart.objects.create(owner=self.customer, in_order=True)
+            order = Order.objects.create(customer=self.customer, first_name='A', last_name='B', phone='1', cart=cart)
+            OrderLine.objects.create(
+                order=order, model_name='biography', object_id=self.biography.id, title='Book {}'.format(number),
+                unit_price=Decimal('10.00'), quantity=1, final_price=Decimal('10.00')
+            )
+        Customer.objects.recount()
+        self.client.force_login(self.user)
+        self.client.get('/profile/')
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/profile/')
+        # session, user, customer, orders with their carts and line counts, line snapshots
+        self.assertEqual(len(captured), 5)
+        self.assertEqual([order.lines_count for order in response.context['orders']], [1, 1])
+        self.assertContains(response, '3 orders, 30.00 USD in total')
+        response = self.client.get('/profile/', {'cursor': response.context['next_cursor']})
+        self.assertContains(response, 'Book 0')
+        Order.objects.first().delete()
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.orders_count, self.customer.lifetime_spend), (2, Decimal('20.00')))
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        calls = []
+
+        def flaky(**payload):
+            calls.append(payload)
+            raise RuntimeError('mail server is down')
+
+        job = Job.objects.create(name='flaky', payload={'order_id': 1}, max_attempts=2)
+        with mock.patch.dict(handlers, {'flaky': flaky}), self.assertLogs('mainapp.jobs', 'ERROR'):
+            self.assertFalse(run_job(claim_jobs(10)[0]))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 1))
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertEqual(claim_jobs(10), [])
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            run_job(claim_jobs(10)[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, len(calls)), (Job.STATUS_FAILED, 2, 2))
+        self.assertIn('mail server is down', job.last_error)
+
+    def test_admin_moves_selected_orders_in_one_update(self):
+        orders = [
+            Order.objects.create(customer=self.customer, first_name='A', last_name='B', phone='1', status=status)
+            for status in (Order.STATUS_NEW, Order.STATUS_NEW, Order.STATUS_READY)
+        ]
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin_user)
+        with CaptureQueriesContext(connection) as captured:
+            self.client.post('/admin/mainapp/order/', {
+                'action': 'move_to_in_progress', '_selected_action': [order.pk for order in orders]
+            })
+        self.assertEqual(len([query for query in captured if query['sql'].startswith('UPDATE "mainapp_order"')]), 1)
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list('status', flat=True)),
+            [Order.STATUS_IN_PROGRESS, Order.STATUS_IN_PROGRESS, Order.STATUS_READY]
+        )
+        self.assertContains(self.client.get('/admin/mainapp/order/?status__exact=in_progress'), '2 orders')
+
+
+class CartLineMigrationTests(TransactionTestCase):
+    """Migration 0019 moves cart lines from the ManyToMany membership to CartProduct.cart."""
+
+    before = [('mainapp', '0018_unique_cart_line')]
+    after = [('mainapp', '0019_cart_lines_by_foreign_key')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('mainapp'))
+
+    def test_lines_follow_the_membership_and_totals_are_recounted(self):
+        apps = self.migrate(self.before)
+        Cart = apps.get_model('mainapp', 'Cart')
+        CartProduct = apps.get_model('mainapp', 'CartProduct')
+        user = apps.get_model('auth', 'User').objects.create(username='migrated')
+        customer = apps.get_model('mainapp', 'Customer').objects.create(user=user)
+        content_type = apps.get_model('contenttypes', 'ContentType').objects.get_or_create(
+            app_label='mainapp', model='biography'
+        )[0]
+        source = Cart.objects.create(owner=customer)
+        target = Cart.objects.create(owner=customer, total_products=3, final_price=Decimal('50.00'))
+
+        def line(cart, object_id, price):
+            return CartProduct.objects.create(
+                user=customer, cart=cart, content_type=content_type, object_id=object_id,
+                unit_price=price, final_price=price
+            )
+
+        moved = line(source, 1, Decimal('10.00'))
+        # the target already has a line of product 2, unique_cart_line keeps this one in its own cart
+        kept = line(source, 2, Decimal('20.00'))
+        own = line(target, 2, Decimal('20.00'))
+        target.products.add(moved, kept, own)
+
+        apps = self.migrate(self.after)
+        CartProduct = apps.get_model('mainapp', 'CartProduct')
+        Cart = apps.get_model('mainapp', 'Cart')
+        self.assertEqual(
+            dict(CartProduct.objects.values_list('id', 'cart')),
+            {moved.id: target.id, kept.id: source.id, own.id: target.id}
+        )
+        self.assertEqual(
+            dict((cart.id, (cart.total_products, cart.final_price)) for cart in Cart.objects.all()),
+            {source.id: (1, Decimal('20.00')), target.id: (2, Decimal('30.00'))}
+        )
@@ -4,7 +4,7 @@ from . import views
 from .views import (
     test_view, 
     ProductDetailView, CategoryDetailView,
-    CartView, AddToCartView, RemoveFromCartView, ChangeQuantityView, ConfirmationView,
+    CartView, AddToCartView, RemoveFromCartView, ChangeQuantityView, CartBatchView, ConfirmationView,
     MakeOrderView, SearchResultsView,
     LoginView, RegistrationView, ProfileView,
     info_about, info_pricing, info_library, info_books_list,
@@ -14,7 +14,6 @@ from .views import (
 # include base.html as a instrument to render the main.html file
 urlpatterns = [
     path('', test_view, name='base'),
-    path('<str:ct_model>/<str:slug>/', ProductDetailView.as_view(), name='product_detail'),
     path('library/<str:slug>/', CategoryDetailView.as_view(), name='category_detail'),   
     path('about', views.info_about, name='about'),
     path('pricing', views.info_pricing, name='pricing'),
@@ -29,6 +28,7 @@ urlpatterns = [
     path('add_to_cart/<str:ct_model>/<str:slug>/', AddToCartView.as_view(), name='add_to_cart'),
     path('remove_from_cart/<str:ct_model>/<str:slug>/', RemoveFromCartView.as_view(), name='remove_from_cart'),
     path('change_quantity/<str:ct_model>/<str:slug>/', ChangeQuantityView.as_view(), name='change_quantity'),
+    path('cart/batch/', CartBatchView.as_view(), name='cart_batch'),
     path('confirmation/', ConfirmationView.as_view(), name='confirmation'),
     path('make_order/', MakeOrderView.as_view(), name='make_order'),
     path('login/', LoginView.as_view(), name='login'),
@@ -36,5 +36,8 @@ urlpatterns = [
     path('registration/', RegistrationView.as_view(), name='registration'),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('captcha/', include('captcha.urls')),
-    path('search/', SearchResultsView.as_view(), name='search_results')
+    path('search/', SearchResultsView.as_view(), name='search_results'),
+    path('profiling/', views.profiling_stats, name='profiling_stats'),
+    # catches every two-segment path, so it has to stay last
+    path('<str:ct_model>/<str:slug>/', ProductDetailView.as_view(), name='product_detail'),
 ]
\ No newline at end of file
@@ -1,3 +1,5 @@
+import re
+
 from django.db import models
 
 
@@ -8,4 +10,23 @@ def recalc_cart(cart):
     else:
         cart.final_price = 0
     cart.total_products = cart_data['id__count']
-    cart.save()
\ No newline at end of file
+    cart.save()
+
+
+ISBN_SEPARATORS = re.compile(r'[\s-]+')
+ISBN_10 = re.compile(r'^\d{9}[\dX]$')
+ISBN_13 = re.compile(r'^\d{13}$')
+
+
+def normalize_isbn(value):
+    # strips hyphens and spaces, ISBN-10 is converted to its 978-prefixed ISBN-13 form
+    isbn = ISBN_SEPARATORS.sub('', value or '').upper()
+    if ISBN_10.match(isbn):
+        isbn = '978' + isbn[:9]
+        checksum = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(isbn))
+        isbn += str((10 - checksum % 10) % 10)
+    return isbn
+
+
+def looks_like_isbn(value):
+    return bool(ISBN_13.match(normalize_isbn(value)))
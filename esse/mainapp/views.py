@@ -1,21 +1,27 @@
 from django.db import transaction
-from django.db import reset_queries
-from django.db.models import Q
+from django.db.models import Count
 from django.conf import settings
 from django.shortcuts import render
-from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.views.generic import DetailView, View, ListView
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 
+import json
 from itertools import chain
 
 
-from .models import Biography, Economics, History, Medicine, Novel, Category, LatestProducts, Customer, Cart, CartProduct, Order, Product
+from .models import Category, LatestProducts, Customer, Cart, OrderLine, CatalogEntry
 from .mixins import CategoryDetailMixin, CartMixin
 from .forms import OrderForm, LoginForm, RegistrationForm
-from .utils import recalc_cart
+from .utils import normalize_isbn, looks_like_isbn
+from .search import search_catalog
+from .pagination import paginate_keyset
+from .jobs import enqueue
+from .registry import product_types
+from .profiling import stats
 
 
 
@@ -31,6 +37,13 @@ def info_pricing(request):
 def info_library(request):
     return render(request, 'library.html', {})
 
+@staff_member_required
+def profiling_stats(request):
+    # per-view histograms collected by QueryProfilingMiddleware in this process, POST resets them
+    if request.method == 'POST':
+        stats.reset()
+    return JsonResponse(stats.snapshot())
+
 def info_books_list(request):
     categories = Category.objects.get_categories_for_left_sidebar()
     products = LatestProducts.objects.get_products_for_main_page(
@@ -76,18 +89,11 @@ def info_novel(request):
 # building a scheme, thats can help to show the url-address of each product
 class ProductDetailView(CartMixin, CategoryDetailMixin, DetailView):
 
-    CT_MODEL_MODEL_CLASS = {
-        'biography': Biography,
-        'economics': Economics,
-        'history': History,
-        'medicine': Medicine,
-        'novel': Novel
-    }
-
     def dispatch(self, request, *args, **kwargs):
 
-        self.model = self.CT_MODEL_MODEL_CLASS[kwargs['ct_model']]
-        self.queryset = self.model._base_manager.all()
+        self.model = product_types.get(kwargs['ct_model']).model
+        # product_detail.html shows the category, so it comes with the product row
+        self.queryset = self.model._base_manager.select_related('category')
         return super().dispatch(request, *args, **kwargs)
 
     context_object_name = 'product'
@@ -117,16 +123,9 @@ class CategoryDetailView(CartMixin, CategoryDetailMixin, DetailView):
 class AddToCartView(CartMixin, View):
 
     def get(self, request, *args, **kwargs):
-        ct_model, product_slug = kwargs.get('ct_model'), kwargs.get('slug')
-        content_type = ContentType.objects.get(model=ct_model)
-        product = content_type.model_class().objects.get(slug=product_slug)
-        cart_product, created = CartProduct.objects.get_or_create(
-            user=self.cart.owner, cart=self.cart, content_type=content_type, object_id=product.id
-        )
-        if created:
-            self.cart.products.add(cart_product)
-        #self.cart.save()
-        recalc_cart(self.cart)
+        product_type = product_types.get(kwargs.get('ct_model'))
+        content_type, product = product_type.content_type, product_type.get_product(kwargs.get('slug'))
+        self.cart.add_product(content_type, product)
         #messages.add_message(request, messages.INFO, "Product added successfully")
         return HttpResponseRedirect('/cart/')
 
@@ -134,15 +133,9 @@ class AddToCartView(CartMixin, View):
 class RemoveFromCartView(CartMixin, View):
 
     def get(self, request, *args, **kwargs):
-        ct_model, product_slug = kwargs.get('ct_model'), kwargs.get('slug')
-        content_type = ContentType.objects.get(model=ct_model)
-        product = content_type.model_class().objects.get(slug=product_slug)
-        cart_product = CartProduct.objects.get(
-            user=self.cart.owner, cart=self.cart, content_type=content_type, object_id=product.id
-        )
-        self.cart.products.remove(cart_product)
-        cart_product.delete()
-        recalc_cart(self.cart)
+        product_type = product_types.get(kwargs.get('ct_model'))
+        content_type, product = product_type.content_type, product_type.get_product(kwargs.get('slug'))
+        self.cart.remove_product(content_type, product)
         messages.add_message(request, messages.INFO, "Product removed successfully")
         return HttpResponseRedirect('/cart/')
 
@@ -150,26 +143,80 @@ class RemoveFromCartView(CartMixin, View):
 class ChangeQuantityView(CartMixin, View):
 
     def post(self, request, *args, **kwargs):
-        ct_model, product_slug = kwargs.get('ct_model'), kwargs.get('slug')
-        content_type = ContentType.objects.get(model=ct_model)
-        product = content_type.model_class().objects.get(slug=product_slug)
-        cart_product = CartProduct.objects.get(
-            user=self.cart.owner, cart=self.cart, content_type=content_type, object_id=product.id
-        )
+        product_type = product_types.get(kwargs.get('ct_model'))
+        content_type, product = product_type.content_type, product_type.get_product(kwargs.get('slug'))
         quantity = int(request.POST.get('quantity'))
-        cart_product.quantity = quantity
-        cart_product.save()
-        recalc_cart(self.cart)
+        self.cart.change_quantity(content_type, product, quantity)
         messages.add_message(request, messages.INFO, "Quantity changed successfully")
         return HttpResponseRedirect('/cart')
 
 
+class CartBatchView(CartMixin, View):
+    """
+    Applies a list of cart operations in one request and answers with the new cart as JSON:
+    {"operations": [{"op": "add" | "remove" | "set_quantity", "ct_model": ..., "slug": ..., "quantity": ...}]}
+    """
+
+    OPERATIONS = ('add', 'remove', 'set_quantity')
+
+    def post(self, request, *args, **kwargs):
+        try:
+            operations = json.loads(request.body)['operations']
+            changes = self.get_changes(operations)
+        except (ValueError, KeyError, TypeError) as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        self.cart.apply_changes(changes)
+        return JsonResponse(self.get_cart_state())
+
+    def get_changes(self, operations):
+        slugs = {}
+        for operation in operations:
+            if operation['op'] not in self.OPERATIONS:
+                raise ValueError('Unknown operation {!r}'.format(operation['op']))
+            slugs.setdefault(operation['ct_model'], set()).add(operation['slug'])
+        # one query per product model for the whole batch
+        products = {}
+        for ct_model, model_slugs in slugs.items():
+            product_type = product_types.by_ct_model.get(ct_model)
+            if product_type is None:
+                raise ValueError('Unknown product type {!r}'.format(ct_model))
+            for slug, product in product_type.get_products(model_slugs).items():
+                products[ct_model, slug] = (product_type.content_type, product)
+        changes = []
+        for operation in operations:
+            key = (operation['ct_model'], operation['slug'])
+            if key not in products:
+                raise ValueError('No {} matches the slug {!r}'.format(*key))
+            quantity = int(operation.get('quantity', 1))
+            if quantity < 1:
+                raise ValueError('Quantity must be positive')
+            changes.append((operation['op'], products[key][0], products[key][1], quantity))
+        return changes
+
+    def get_cart_state(self):
+        return {
+            'total_products': self.cart.total_products,
+            'final_price': str(self.cart.final_price),
+            'lines': [
+                {
+                    'ct_model': item.content_object.get_model_name() if item.content_object is not None else None,
+                    'slug': item.content_object.slug if item.content_object is not None else None,
+                    'title': item.title,
+                    'quantity': item.quantity,
+                    'final_price': str(item.final_price),
+                }
+                for item in self.cart.items()
+            ]
+        }
+
+
 class CartView(CartMixin, View):
 
     def get(self, request, *args, **kwargs):
         categories = Category.objects.get_categories_for_left_sidebar()
         context = {
             'cart': self.cart,
+            'cart_items': self.cart.items(),
             'categories': categories
         }
         return render (request, 'cart.html', context)
@@ -182,6 +229,7 @@ class ConfirmationView(CartMixin, View):
         form = OrderForm(request.POST or None)
         context = {
             'cart': self.cart,
+            'cart_items': self.cart.items(),
             'categories': categories,
             'form': form
         }
@@ -190,26 +238,29 @@ class ConfirmationView(CartMixin, View):
 
 class MakeOrderView(CartMixin, View):
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
+        # anonymous carts live in the session and are merged into a customer cart on login
+        if not request.user.is_authenticated:
+            return HttpResponseRedirect('/login/')
         form = OrderForm(request.POST or None)
-        customer = Customer.objects.get(user=request.user)
         if form.is_valid():
+            cart = self.cart
             new_order = form.save(commit=False)
-            new_order.customer = customer
-            new_order.first_name = form.cleaned_data['first_name']
-            new_order.last_name = form.cleaned_data['last_name']
-            new_order.phone = form.cleaned_data['phone']
-            new_order.address = form.cleaned_data['address']
-            new_order.purchase_type = form.cleaned_data['purchase_type']
-            new_order.order_date = form.cleaned_data['order_date']
-            new_order.comment = form.cleaned_data['comment']
-            new_order.save()
-            self.cart.in_order = True
-            self.cart.save()
-            new_order.cart = self.cart
-            new_order.save()
-            customer.orders.add(new_order)
+            new_order.customer_id = cart.owner_id
+            new_order.cart = cart
+            # a short transaction of four writes, the conditional update lets only one checkout of a cart through
+            with transaction.atomic():
+                if not Cart.objects.filter(pk=cart.pk, in_order=False).update(in_order=True, updated_at=timezone.now()):
+                    messages.add_message(request, messages.INFO, 'This cart has already been ordered.')
+                    return HttpResponseRedirect('/cart/')
+                new_order.save()
+                lines = OrderLine.objects.snapshot(new_order, cart)
+                Customer.objects.record_order(new_order.customer_id, sum(line.final_price for line in lines))
+                # mails and the corrective rollup recount run in the run_jobs worker once the order is committed
+                enqueue('send_order_confirmation', order_id=new_order.id)
+                enqueue('notify_manager', order_id=new_order.id)
+                enqueue('recount_customer_orders', customer_id=new_order.customer_id)
+            self.forget_cart()
             messages.add_message(request, messages.INFO, 'Thanks for order! Our Manager will call you in 10 minutes approximately.')
             return HttpResponseRedirect('/')
         return HttpResponseRedirect('confirmation')
@@ -235,6 +286,7 @@ class LoginView(CartMixin, View):
             user = authenticate(username=username, password=password)
             if user:
                 login(request, user)
+                self.merge_anonymous_cart()
                 return HttpResponseRedirect('/')
         context = {
             'form': form,
@@ -273,6 +325,7 @@ class RegistrationView(CartMixin, View):
             )
             user = authenticate(username=form.cleaned_data['username'], password=form.cleaned_data['password'])
             login(request, user)
+            self.merge_anonymous_cart()
             return HttpResponseRedirect('/')
         context = {
             'form': form,
@@ -283,40 +336,49 @@ class RegistrationView(CartMixin, View):
 
 class ProfileView(CartMixin, View):
 
+    # newest first, the id keeps orders of the same second apart
+    ORDERS_ORDERING = ('-created_at', '-id')
+
     def get(self, request, *args, **kwargs):
-        customer = Customer.objects.get(user=request.user)
-        orders = Order.objects.filter(customer=customer).order_by('-created_at')
-        categories = Category.objects.all()
+        customer = self.customer
+        # cart totals and line counts come with the orders, the line snapshots with one prefetch
+        orders = customer.related_orders.select_related('cart').annotate(
+            lines_count=Count('lines')
+        ).prefetch_related('lines')
+        page = paginate_keyset(orders, self.ORDERS_ORDERING, cursor=request.GET.get('cursor'))
         return render(
             request,
             'profile.html',
             {
-                'orders': orders,
-                'cart': self.cart,
-                'categories':categories
+                'customer': customer,
+                'orders': page.object_list,
+                'next_cursor': page.next_cursor,
+                'previous_cursor': page.previous_cursor
             }
         )
 
 
 class SearchResultsView(ListView):
-    model = Biography, Economics, History,Medicine, Novel
+    model = CatalogEntry
     template_name = 'search_results.html'
+
+    def get(self, request, *args, **kwargs):
+        # scanned barcodes go straight to the book through the ISBN index
+        query = request.GET.get('q', '')
+        if looks_like_isbn(query):
+            product = CatalogEntry.objects.only('model_name', 'slug').filter(ISBN_13=normalize_isbn(query)).first()
+            if product:
+                return HttpResponseRedirect(product.get_absolute_url())
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
-        query = self.request.GET.get('q')
-        object_list_1 = Biography.objects.filter(
-            Q(title__icontains=query) | Q(ISBN_13__icontains=query) | Q(authorship__icontains=query) | Q(publisher__icontains=query)
-        )
-        object_list_2 = Economics.objects.filter(
-            Q(title__icontains=query) | Q(ISBN_13__icontains=query) | Q(theme__icontains=query) | Q(publisher__icontains=query)
-        )
-        object_list_3 = History.objects.filter(
-            Q(title__icontains=query) | Q(ISBN_13__icontains=query) | Q(period__icontains=query) | Q(publisher__icontains=query)
-        )
-        object_list_4 = Medicine.objects.filter(
-            Q(title__icontains=query) | Q(ISBN_13__icontains=query) | Q(theme__icontains=query) | Q(publisher__icontains=query)
-        )
-        object_list_5 = Novel.objects.filter(
-            Q(title__icontains=query) | Q(ISBN_13__icontains=query) | Q(publisher__icontains=query)
-        )
-        object_list = object_list_1, object_list_2, object_list_3, object_list_4, object_list_5
-        return object_list_1 or object_list_2 or object_list_3 or object_list_4 or object_list_5
\ No newline at end of file
+        # ranked full-text match over every product type at once
+        self.page = search_catalog(self.request.GET.get('q', ''), cursor=self.request.GET.get('cursor'))
+        return self.page.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['next_cursor'] = self.page.next_cursor
+        context['previous_cursor'] = self.page.previous_cursor
+        return context